@@ -0,0 +1,288 @@
+import os
+import json
+import time
+import math
+import logging
+
+import numpy as np
+import faiss
+
+from app.chunk_store import read_index_mmap
+
+# === CONFIGURATIONS ===
+# flat  : exact brute-force search (the langchain FAISS store itself)
+# ivf   : IVF with trained centroids, exact distances inside the probed lists
+# hnsw  : HNSW graph over the full vectors
+# ivfpq : IVF with product-quantized (compressed) vectors
+INDEX_TYPE = os.getenv("INDEX_TYPE", "flat").lower()
+INDEX_TYPES = ("flat", "ivf", "hnsw", "ivfpq")
+ANN_INDEX_FILE = "ann.faiss"  # the ANN index, rows line up with index.faiss
+ANN_META_FILE = "ann_index.json"  # type, search parameters and the recall/latency report
+TARGET_RECALL = 0.95  # nprobe / efSearch are tuned to reach this recall@k vs flat
+REPORT_QUERIES = 200  # corpus vectors used as queries for tuning and the report
+REPORT_K = 20  # recall@k measured at the compare TOP_K
+MIN_TRAIN_POINTS_PER_LIST = 39  # faiss' own minimum for k-means
+PQ_BITS = 8
+HNSW_M = 32
+RETRAIN_FACTOR = float(os.getenv("ANN_RETRAIN_FACTOR", "2"))  # retrain once the store is this much larger / smaller than at training
+MAX_DELETED_FRACTION = 0.2  # hnsw: rebuild once this share of its rows are vectors deleted from the store
+
+logger = logging.getLogger(__name__)
+
+# The flat store (index.faiss + chunks.sqlite) stays the source of truth: it is
+# what ingest adds to and deletes from, and what exact scores are computed
+# from. The ANN index is only used to find candidate rows quickly. Changes to
+# the store are applied to it incrementally (see update_ann_index); it is
+# trained and tuned again only when the store drifted far from the size it
+# was trained at.
+
+
+def _auto_nlist(ntotal):
+    """~4*sqrt(N) lists, capped so every list gets enough training points."""
+    nlist = int(4 * math.sqrt(ntotal))
+    return max(1, min(nlist, ntotal // MIN_TRAIN_POINTS_PER_LIST))
+
+
+def _pq_subquantizers(dim):
+    """Largest m <= dim/8 dividing dim (about 8 dims per 1-byte code)."""
+    for m in range(max(1, dim // 8), 0, -1):
+        if dim % m == 0:
+            return m
+    return 1
+
+
+def _build(index_type, vectors, ids):
+    """Create, train and fill an index of the given type. Returns (index, build params).
+
+    Vectors are added under their chunk ids, so hits line up with the store.
+    """
+    ntotal, dim = vectors.shape
+    if index_type == "hnsw":
+        hnsw = faiss.IndexHNSWFlat(dim, HNSW_M)
+        hnsw.hnsw.efConstruction = 200
+        index = faiss.IndexIDMap(hnsw)  # HNSW has no native id support
+        index.add_with_ids(vectors, ids)
+        return index, {"M": HNSW_M}
+
+    nlist = _auto_nlist(ntotal)
+    quantizer = faiss.IndexFlatL2(dim)
+    if index_type == "ivfpq":
+        m = _pq_subquantizers(dim)
+        index = faiss.IndexIVFPQ(quantizer, dim, nlist, m, PQ_BITS)
+        params = {"nlist": nlist, "m": m, "nbits": PQ_BITS}
+    else:
+        index = faiss.IndexIVFFlat(quantizer, dim, nlist)
+        params = {"nlist": nlist}
+
+    # train on a sample, enough for k-means without paying for the whole corpus
+    sample_size = min(ntotal, nlist * 256)
+    sample = vectors[np.random.default_rng(0).choice(ntotal, sample_size, replace=False)]
+    index.train(sample)
+    index.add_with_ids(vectors, ids)
+    return index, params
+
+
+def set_search_params(index, params):
+    """Apply nprobe / efSearch from the saved metadata to a loaded index."""
+    if "nprobe" in params:
+        faiss.extract_index_ivf(index).nprobe = params["nprobe"]
+    if "efSearch" in params:
+        faiss.downcast_index(index.index).hnsw.efSearch = params["efSearch"]
+
+
+def _recall_and_latency(index, queries, truth, k):
+    start = time.perf_counter()
+    _, found = index.search(queries, k)
+    latency_ms = (time.perf_counter() - start) * 1000 / len(queries)
+    hits = sum(len(set(f[f != -1]) & set(t[t != -1])) for f, t in zip(found, truth))
+    return hits / max(1, (truth != -1).sum()), latency_ms
+
+
+def _tune(index_type, index, flat_index, vectors, k):
+    """Pick the cheapest nprobe / efSearch reaching TARGET_RECALL; return (params, report)."""
+    rng = np.random.default_rng(1)
+    queries = vectors[rng.choice(len(vectors), min(REPORT_QUERIES, len(vectors)), replace=False)]
+    k = min(k, len(vectors))
+
+    start = time.perf_counter()
+    _, truth = flat_index.search(queries, k)
+    flat_latency_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+    if index_type == "hnsw":
+        name, candidates = "efSearch", [16, 32, 64, 128, 256, 512]
+    else:
+        name = "nprobe"
+        candidates = sorted({n for n in (1, 2, 4, 8, 16, 32, 64, 128, 256) if n < index.nlist} | {index.nlist})
+
+    tuning = []
+    chosen = None
+    for value in candidates:
+        set_search_params(index, {name: value})
+        recall, latency_ms = _recall_and_latency(index, queries, truth, k)
+        tuning.append({name: value, "recall": round(recall, 4), "latency_ms": round(latency_ms, 4)})
+        if recall >= TARGET_RECALL:
+            chosen = value
+            break
+    if chosen is None:  # target not reachable, take the best recall we saw
+        chosen = max(tuning, key=lambda row: row["recall"])[name]
+
+    report = {
+        "k": k,
+        "queries": len(queries),
+        "target_recall": TARGET_RECALL,
+        "flat_latency_ms": round(flat_latency_ms, 4),
+        "tuning": tuning,
+    }
+    return {name: chosen}, report
+
+
+def remove_ann_index(output_path):
+    for name in (ANN_INDEX_FILE, ANN_META_FILE):
+        path = os.path.join(output_path, name)
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def load_ann_meta(output_path):
+    path = os.path.join(output_path, ANN_META_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def ann_index_is_current(output_path, index_type=None):
+    """True if the saved ANN files were built for the configured type."""
+    index_type = (index_type or INDEX_TYPE).lower()
+    meta = load_ann_meta(output_path)
+    if meta is None:
+        return index_type == "flat"
+    return meta.get("requested_type") == index_type
+
+
+def build_ann_index(output_path, flat_index, index_type=None):
+    """Build the configured ANN index from the flat index and save it with its report.
+
+    flat_index is the store's IndexIDMap2; the ANN index uses the same ids.
+
+    Falls back to a lighter type when the corpus is too small to train it
+    (ivfpq -> ivf -> flat). Returns the metadata written (None for flat).
+    """
+    index_type = requested_type = (index_type or INDEX_TYPE).lower()
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown INDEX_TYPE {index_type!r}, expected one of {', '.join(INDEX_TYPES)}")
+
+    ntotal = flat_index.ntotal
+    if index_type == "ivfpq" and ntotal < 256 * MIN_TRAIN_POINTS_PER_LIST:
+        logger.info("Only %d vectors, too few to train PQ codebooks; using ivf instead.", ntotal)
+        index_type = "ivf"
+    if index_type == "ivf" and _auto_nlist(ntotal) < 2:
+        logger.info("Only %d vectors, too few for IVF; using the flat index.", ntotal)
+        index_type = "flat"
+    if index_type == "flat" or ntotal == 0:
+        remove_ann_index(output_path)
+        return None
+
+    vectors = flat_index.index.reconstruct_n(0, ntotal)
+    ids = faiss.vector_to_array(flat_index.id_map).astype(np.int64)
+    start = time.perf_counter()
+    index, build_params = _build(index_type, vectors, ids)
+    build_seconds = time.perf_counter() - start
+
+    search_params, report = _tune(index_type, index, flat_index, vectors, REPORT_K)
+    set_search_params(index, search_params)
+    report["build_seconds"] = round(build_seconds, 3)
+    meta = {
+        "requested_type": requested_type,
+        "index_type": index_type,
+        "ntotal": ntotal,
+        "trained_ntotal": ntotal,
+        "deleted_ids": [],
+        "build_params": build_params,
+        "search_params": search_params,
+        "report": report,
+    }
+    logger.info(
+        "Built %s index over %d vectors, %s: %s (flat %s ms/query)",
+        index_type, ntotal, search_params, report["tuning"][-1], report["flat_latency_ms"],
+    )
+    _save(output_path, index, meta)
+    return meta
+
+
+def _save(output_path, index, meta):
+    # index first, then the metadata that marks it as valid
+    index_path = os.path.join(output_path, ANN_INDEX_FILE)
+    faiss.write_index(index, index_path + ".tmp")
+    os.replace(index_path + ".tmp", index_path)
+    meta_path = os.path.join(output_path, ANN_META_FILE)
+    with open(meta_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+    os.replace(meta_path + ".tmp", meta_path)
+
+
+def load_ann_index(output_path, ntotal):
+    """Load the saved ANN index with its tuned search parameters, or None.
+
+    An index whose row count does not match the flat store (plus the hnsw
+    rows of deleted vectors, see ann_deleted_ids) is stale and ignored.
+    """
+    meta = load_ann_meta(output_path)
+    index_path = os.path.join(output_path, ANN_INDEX_FILE)
+    if meta is None or not os.path.exists(index_path):
+        return None
+    index = read_index_mmap(index_path)
+    if index.ntotal != ntotal + len(meta.get("deleted_ids", [])):
+        logger.warning("%s has %d rows, store has %d; ignoring it.", ANN_INDEX_FILE, index.ntotal, ntotal)
+        return None
+    set_search_params(index, meta["search_params"])
+    return index
+
+
+def ann_deleted_ids(output_path):
+    """Ids still in a saved hnsw index whose vectors are gone from the store; searches must skip them."""
+    return np.asarray((load_ann_meta(output_path) or {}).get("deleted_ids", []), dtype=np.int64)
+
+
+def _drifted(meta, ntotal):
+    trained = meta.get("trained_ntotal", meta.get("ntotal", 0))
+    return ntotal > trained * RETRAIN_FACTOR or ntotal * RETRAIN_FACTOR < trained
+
+
+def update_ann_index(output_path, flat_index, added_ids=(), removed_ids=(), index_type=None, rebuild=False):
+    """Apply a change of the flat index (vectors added / removed under these ids) to the saved ANN index.
+
+    The trained index is reused: new vectors are added to it and removed ones
+    taken out, so the cost follows the size of the change. hnsw cannot
+    remove vectors; their ids are listed in the metadata (deleted_ids) and
+    skipped by searches until MAX_DELETED_FRACTION of the rows are such.
+    It is built from scratch, training and tuning included, only with
+    rebuild (a new store), without a saved index, when INDEX_TYPE changed
+    or when the store is RETRAIN_FACTOR times larger or smaller than when
+    it was trained. Returns the metadata written (None for flat).
+    """
+    meta = load_ann_meta(output_path)
+    index_path = os.path.join(output_path, ANN_INDEX_FILE)
+    ntotal = flat_index.ntotal
+    if (rebuild or meta is None or not os.path.exists(index_path) or not ann_index_is_current(output_path, index_type)
+            or _drifted(meta, ntotal)):
+        return build_ann_index(output_path, flat_index, index_type)
+
+    index = faiss.read_index(index_path)
+    deleted = set(meta.get("deleted_ids", []))
+    removed_ids = np.asarray(removed_ids, dtype=np.int64)
+    if len(removed_ids):
+        if meta["index_type"] == "hnsw":
+            deleted.update(int(i) for i in removed_ids)
+        else:
+            index.remove_ids(removed_ids)
+    added_ids = np.asarray(added_ids, dtype=np.int64)
+    if len(added_ids):
+        index.add_with_ids(np.ascontiguousarray(flat_index.reconstruct_batch(added_ids), dtype=np.float32), added_ids)
+    if len(deleted) > MAX_DELETED_FRACTION * index.ntotal:
+        return build_ann_index(output_path, flat_index, index_type)
+
+    meta.update(ntotal=ntotal, deleted_ids=sorted(deleted))
+    _save(output_path, index, meta)
+    logger.info("Updated %s index: +%d / -%d vectors, %d in total", meta["index_type"], len(added_ids), len(removed_ids), ntotal)
+    return meta
@@ -0,0 +1,242 @@
+import os
+import json
+import time
+import random
+import shutil
+import resource
+import argparse
+import platform
+from datetime import datetime, timezone
+
+import numpy as np
+
+from app import compare_cvs, extract_cache, query_cache
+from app.ann_index import INDEX_TYPE
+from app.cv_chunker import CHUNKER
+from app.embed_files import embed_folder, PARSE_WORKERS
+from app.embedding_backends import EMBEDDING_BACKEND
+from app.sample_cv_creator import generate_corpus, make_job_description, ROLES, FORMATS
+
+# === CONFIGURATIONS ===
+WORK_DIR = "bench_work"  # corpus, store and extract cache of the benchmark live here
+RESULTS_FILE = "bench_results.json"
+NUM_CVS = 1000
+NUM_QUERIES = 200
+N_RESULTS = 10  # CV-level mode queries ask for this many files
+PERCENTILES = (50, 95, 99)
+
+# embed_folder reports these stages through its progress callback, in this order
+STAGE_NAMES = {"load": "parse", "chunk": "chunk", "embed": "embed", "save": "save", "index": "index"}
+
+
+# === Measurements ===
+def peak_rss_mb():
+    """Peak resident set size so far, of this process and of its (finished) parse workers."""
+    # ru_maxrss is in kilobytes on Linux, bytes on macOS
+    scale = 1 if platform.system() == "Darwin" else 1024
+    return {
+        "self": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 2**20,
+        "children": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale / 2**20,
+    }
+
+
+def latency_stats(seconds):
+    """p50/p95/p99/mean/max of a list of durations, in milliseconds."""
+    ms = np.asarray(seconds, dtype=np.float64) * 1000
+    stats = {f"p{p}": float(np.percentile(ms, p)) for p in PERCENTILES}
+    stats.update(mean=float(ms.mean()), max=float(ms.max()), count=len(ms))
+    return stats
+
+
+class StageTimer:
+    """progress callback for embed_folder that times each stage.
+
+    A stage runs from its first progress call until the next stage starts;
+    "setup" is everything before parsing starts (model load, fingerprinting).
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.marks = []  # (stage, time of its first call)
+
+    def __call__(self, stage, done, total, failed_files):
+        if not self.marks or self.marks[-1][0] != stage:
+            self.marks.append((stage, time.perf_counter()))
+
+    def stages(self, finished):
+        timings = {"setup": (self.marks[0][1] if self.marks else finished) - self.started}
+        for (stage, start), end in zip(self.marks, [t for _, t in self.marks[1:]] + [finished]):
+            timings[STAGE_NAMES.get(stage, stage)] = end - start
+        return timings
+
+
+# === Benchmark steps ===
+def prepare_corpus(folder, count, formats, seed):
+    """Generate the corpus unless the folder already holds exactly this one."""
+    marker = os.path.join(folder, ".corpus.json")
+    spec = {"count": count, "formats": list(formats), "seed": seed}
+    if os.path.exists(marker):
+        with open(marker) as f:
+            if json.load(f) == spec:
+                print(f"[INFO] Reusing corpus in {folder}")
+                return 0.0
+    shutil.rmtree(folder, ignore_errors=True)
+    started = time.perf_counter()
+    generate_corpus(folder, count, formats=formats, seed=seed)
+    elapsed = time.perf_counter() - started
+    with open(marker, "w") as f:
+        json.dump(spec, f)
+    return elapsed
+
+
+def bench_ingest(folder, store_path, cache_dir):
+    """Cold ingest of folder into a fresh store; returns per-stage timings and the summary counts."""
+    shutil.rmtree(store_path, ignore_errors=True)
+    if cache_dir is not None:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+        extract_cache.EXTRACT_CACHE_DIR = cache_dir
+
+    timer = StageTimer()
+    summary = embed_folder(folder, store_path, progress=timer)
+    finished = time.perf_counter()
+    total = finished - timer.started
+    files = summary["added"] + len(summary["duplicates"])
+    return {
+        "stages_s": timer.stages(finished),
+        "total_s": total,
+        "files": files,
+        "files_per_s": files / total if total else 0.0,
+        "documents": summary["total_documents"],
+        "chunks": summary["total_chunks"],
+        "duplicates": len(summary["duplicates"]),
+        "failed_files": len(summary["failed_files"]),
+        "extract_cache": summary["extract_cache"],
+        "index": summary["index"],
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def bench_queries(store_path, num_queries, n_results, seed):
+    """Query latency over the store: embedding, chunk search + grouping, and CV-level search."""
+    compare_cvs.VECTOR_DB_PATH = store_path
+    query_cache.set_backend("off")  # measure the search itself, not cache hits
+    rng = random.Random(seed)
+    queries = [make_job_description(rng, rng.choice(list(ROLES))) for _ in range(num_queries)]
+
+    started = time.perf_counter()
+    vectorstore, index_state = compare_cvs.load_index_state()
+    store_load = time.perf_counter() - started
+    if vectorstore is None:
+        raise RuntimeError(f"No vector store at {store_path}")
+    compare_cvs.embed_query(queries[0])  # load the model outside the timings
+
+    embed, search, cv_level, end_to_end = [], [], [], []
+    for query in queries:
+        t0 = time.perf_counter()
+        vector = compare_cvs.embed_query(query)
+        t1 = time.perf_counter()
+        compare_cvs.group_by_file(compare_cvs.search_chunks(vectorstore, index_state, vector, compare_cvs.TOP_K)[0])
+        t2 = time.perf_counter()
+        compare_cvs.top_files(vectorstore, index_state, vector, n_results)
+        t3 = time.perf_counter()
+        embed.append(t1 - t0)
+        search.append(t2 - t1)
+        cv_level.append(t3 - t2)
+        end_to_end.append(t2 - t0)
+
+    return {
+        "queries": num_queries,
+        "vector_store_load_s": store_load,
+        "embed_ms": latency_stats(embed),
+        "search_ms": latency_stats(search),
+        "cv_level_search_ms": latency_stats(cv_level),
+        "end_to_end_ms": latency_stats(end_to_end),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def run_benchmark(num_cvs=NUM_CVS, num_queries=NUM_QUERIES, formats=FORMATS, seed=0, work_dir=WORK_DIR,
+                  n_results=N_RESULTS, warm_cache=False):
+    """Generate (or reuse) a corpus, ingest it from scratch and time queries against it."""
+    folder = os.path.join(work_dir, f"cv_documents_{num_cvs}")
+    store_path = os.path.join(work_dir, "cv_vectorstore")
+    cache_dir = None if warm_cache else os.path.join(work_dir, "extract_cache")
+
+    generate_s = prepare_corpus(folder, num_cvs, formats, seed)
+    ingest = bench_ingest(folder, store_path, cache_dir)
+    query = bench_queries(store_path, num_queries, n_results, seed)
+    return {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "config": {
+            "cvs": num_cvs,
+            "formats": list(formats),
+            "seed": seed,
+            "queries": num_queries,
+            "n_results": n_results,
+            "embedding_backend": EMBEDDING_BACKEND,
+            "index_type": INDEX_TYPE,
+            "chunker": CHUNKER,
+            "parse_workers": PARSE_WORKERS,
+            "warm_extract_cache": warm_cache,
+            "python": platform.python_version(),
+            "cpus": os.cpu_count(),
+        },
+        "corpus_generate_s": generate_s,
+        "ingest": ingest,
+        "query": query,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+# === Comparing runs ===
+def _flatten(results, prefix=""):
+    flat = {}
+    for key, value in results.items():
+        if isinstance(value, dict):
+            flat.update(_flatten(value, f"{prefix}{key}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+
+def compare_results(current, baseline):
+    """Relative change of every timing / memory figure against a previous results file."""
+    base = _flatten({k: baseline.get(k, {}) for k in ("ingest", "query", "peak_rss_mb")})
+    cur = _flatten({k: current.get(k, {}) for k in ("ingest", "query", "peak_rss_mb")})
+    return {
+        key: {"baseline": base[key], "current": value, "change": (value - base[key]) / base[key]}
+        for key, value in cur.items()
+        if key in base and base[key] and (key.endswith("_s") or "_ms." in key or "_s." in key or "rss" in key)
+    }
+
+
+# Run the benchmark
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark ingest and query on a synthetic CV corpus.")
+    parser.add_argument("--cvs", type=int, default=NUM_CVS)
+    parser.add_argument("--queries", type=int, default=NUM_QUERIES)
+    parser.add_argument("--formats", default=",".join(FORMATS), help="comma-separated: pdf,docx,txt")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--n-results", type=int, default=N_RESULTS)
+    parser.add_argument("--work-dir", default=WORK_DIR)
+    parser.add_argument("--warm-cache", action="store_true", help="use the shared extracted-text cache instead of parsing cold")
+    parser.add_argument("--output", default=RESULTS_FILE)
+    parser.add_argument("--baseline", help="earlier results file to compare against")
+    args = parser.parse_args()
+
+    results = run_benchmark(
+        args.cvs, args.queries, formats=args.formats.split(","), seed=args.seed, work_dir=args.work_dir,
+        n_results=args.n_results, warm_cache=args.warm_cache,
+    )
+    if args.baseline:
+        with open(args.baseline) as f:
+            results["vs_baseline"] = compare_results(results, json.load(f))
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+
+    print(json.dumps({"ingest_stages_s": results["ingest"]["stages_s"], "end_to_end_ms": results["query"]["end_to_end_ms"],
+                      "peak_rss_mb": results["peak_rss_mb"]}, indent=2))
+    for key, change in sorted(results.get("vs_baseline", {}).items(), key=lambda item: -item[1]["change"]):
+        if abs(change["change"]) >= 0.1:
+            print(f"{key}: {change['baseline']:.3f} -> {change['current']:.3f} ({change['change']:+.0%})")
+    print(f"Results written to {args.output}")
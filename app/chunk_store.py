@@ -0,0 +1,588 @@
+import os
+import json
+import sqlite3
+import threading
+from collections import Counter
+
+import numpy as np
+import faiss
+from langchain_core.documents import Document
+
+from app.lexical_index import tokenize, term_counts, idf, bm25, contains_phrase
+
+# === CONFIGURATIONS ===
+INDEX_FILE = "index.faiss"  # FAISS IndexIDMap2 over a flat index, ids = chunk row ids
+CHUNK_DB_FILE = "chunks.sqlite"  # chunk text + metadata, fetched by id only for hits
+CHUNK_DELTA_FILE = "chunks.delta.sqlite"  # rows added / removed since CHUNK_DB_FILE was written
+DELTA_MERGE_FRACTION = float(os.getenv("CHUNK_DELTA_MERGE_FRACTION", "0.1"))  # of the base's rows
+SQLITE_MAX_VARIABLES = 900  # stay below SQLite's bound-parameter limit per query
+DEFAULT_SECTION = "other"  # section of chunks without section metadata (see cv_chunker)
+
+# === Chunk store ===
+# Replaces the langchain FAISS store and its pickled docstore (index.pkl).
+# Vectors live in the FAISS index, which readers open memory-mapped so that
+# several uvicorn workers share the same pages. Text and metadata live in
+# SQLite and are read lazily: a query only loads the rows of its hits.
+#
+# Removing a single file (tombstone_files) only touches SQLite: its rows are
+# deleted and their ids recorded in deleted_ids, so the cost follows the size
+# of the file. Searches over-fetch by the tombstone count and drop ids that
+# have no row. The vectors themselves are purged by compact(), which ingest
+# runs whenever it rewrites the index anyway.
+#
+# The same database holds an inverted index over the chunk text (postings,
+# chunk_lengths, term_stats; see app.lexical_index), kept in step with the
+# chunk rows by add_chunks and every delete. It serves keyword filters and
+# BM25 scores.
+#
+# A store opened for writing never writes chunks.sqlite, which generations
+# share by hard link: rows added and removed since it was written go to a
+# small delta database (chunks.delta.sqlite; added rows, removed_ids, signed
+# term_stats). Connections attach the base and shadow its tables with TEMP
+# views (base minus removed rows, plus the delta's), so reading code does not
+# see the split. A new generation copies only the delta, so single-file
+# writes stay O(file); once the delta outgrows DELTA_MERGE_FRACTION of the
+# base, save() folds it into a new base (merge_delta).
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS chunks (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    chunk_id TEXT NOT NULL UNIQUE,
+    source_file TEXT NOT NULL,
+    file_name TEXT NOT NULL,
+    page_content TEXT NOT NULL,
+    metadata TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_chunks_source_file ON chunks (source_file);
+CREATE TABLE IF NOT EXISTS deleted_ids (
+    id INTEGER PRIMARY KEY
+);
+CREATE TABLE IF NOT EXISTS postings (
+    term TEXT NOT NULL,
+    id INTEGER NOT NULL,
+    tf INTEGER NOT NULL,
+    PRIMARY KEY (term, id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS ix_postings_id ON postings (id);
+CREATE TABLE IF NOT EXISTS chunk_lengths (
+    id INTEGER PRIMARY KEY,
+    length INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS term_stats (
+    term TEXT PRIMARY KEY,
+    df INTEGER NOT NULL
+) WITHOUT ROWID;
+"""
+
+# Only in the delta: base rows it removed, and the base's size when it was started
+_DELTA_SCHEMA = """
+CREATE TABLE IF NOT EXISTS removed_ids (
+    id INTEGER PRIMARY KEY
+);
+CREATE TABLE IF NOT EXISTS base_info (
+    chunks INTEGER NOT NULL
+);
+"""
+
+# Tables keyed by chunk id, read as base minus removed_ids plus the delta's rows
+_OVERLAID_TABLES = ("chunks", "postings", "chunk_lengths")
+
+_MERGE_DELTA = """
+BEGIN;
+DELETE FROM main.chunks WHERE id IN (SELECT id FROM delta.removed_ids);
+DELETE FROM main.postings WHERE id IN (SELECT id FROM delta.removed_ids);
+DELETE FROM main.chunk_lengths WHERE id IN (SELECT id FROM delta.removed_ids);
+INSERT INTO main.chunks SELECT * FROM delta.chunks;
+INSERT INTO main.postings SELECT * FROM delta.postings;
+INSERT INTO main.chunk_lengths SELECT * FROM delta.chunk_lengths;
+INSERT INTO main.term_stats (term, df) SELECT term, df FROM delta.term_stats WHERE true
+    ON CONFLICT(term) DO UPDATE SET df = df + excluded.df;
+DELETE FROM main.term_stats WHERE df <= 0;
+INSERT OR IGNORE INTO main.deleted_ids SELECT id FROM delta.deleted_ids;
+UPDATE main.sqlite_sequence
+    SET seq = MAX(seq, COALESCE((SELECT seq FROM delta.sqlite_sequence WHERE name = 'chunks'), 0))
+    WHERE name = 'chunks';
+COMMIT;
+"""
+
+
+def store_exists(path):
+    return os.path.exists(os.path.join(path, INDEX_FILE)) and os.path.exists(os.path.join(path, CHUNK_DB_FILE))
+
+
+def copy_database(source, target):
+    """Copy a SQLite database with the backup API (consistent even while someone reads it)."""
+    src_conn = sqlite3.connect(f"file:{source}?mode=ro", uri=True)
+    dst_conn = sqlite3.connect(target)
+    try:
+        src_conn.backup(dst_conn)
+    finally:
+        dst_conn.close()
+        src_conn.close()
+
+
+def chunk_sections(metadata):
+    """The CV sections a chunk covers, from its metadata."""
+    return metadata.get("sections") or [metadata.get("section", DEFAULT_SECTION)]
+
+
+def read_index_mmap(index_path):
+    """Open a FAISS index memory-mapped where this faiss build supports it."""
+    for flag_name in ("IO_FLAG_MMAP_IFC", "IO_FLAG_MMAP"):
+        flag = getattr(faiss, flag_name, None)
+        if flag is None:
+            continue
+        try:
+            return faiss.read_index(index_path, flag)
+        except RuntimeError:
+            continue
+    return faiss.read_index(index_path)
+
+
+class ChunkStore:
+    """FAISS vectors + SQLite chunk rows, sharing one integer id per chunk."""
+
+    def __init__(self, path, index, read_only, db_file=CHUNK_DB_FILE, overlay=False):
+        self.path = path
+        self._index = index
+        self._index_dirty = False
+        self.read_only = read_only
+        self.db_file = db_file
+        self.overlay = overlay  # reading base + delta, writing the delta only
+        self._base_tables = set()
+        self._local = threading.local()
+        self._write_conn = None if read_only else self._connect()
+
+    # --- opening -----------------------------------------------------------
+    @classmethod
+    def create(cls, path, dim):
+        """Start an empty store at path. It replaces whatever is there on save()."""
+        os.makedirs(path, exist_ok=True)
+        db_file = CHUNK_DB_FILE + ".new"
+        db_path = os.path.join(path, db_file)
+        if os.path.exists(db_path):
+            os.remove(db_path)
+        store = cls(path, faiss.IndexIDMap2(faiss.IndexFlatL2(dim)), read_only=False, db_file=db_file)
+        store._index_dirty = True
+        return store
+
+    @classmethod
+    def open(cls, path, read_only=True):
+        """Open an existing store, or return None if there is none at path.
+
+        Read-only stores map the index instead of reading it into memory.
+        Writable stores read the index only once something needs it, so
+        SQLite-only operations (tombstone_files) never load it, and write
+        their rows to the delta.
+        """
+        if not store_exists(path):
+            return None
+        index = read_index_mmap(os.path.join(path, INDEX_FILE)) if read_only else None
+        overlay = not read_only or os.path.exists(os.path.join(path, CHUNK_DELTA_FILE))
+        return cls(path, index, read_only=read_only, overlay=overlay)
+
+    @property
+    def index(self):
+        if self._index is None:
+            self._index = faiss.read_index(os.path.join(self.path, INDEX_FILE))
+        return self._index
+
+    def _connect(self):
+        db_path = os.path.join(self.path, CHUNK_DELTA_FILE if self.overlay else self.db_file)
+        if self.read_only:
+            conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True, check_same_thread=False)
+        else:
+            conn = sqlite3.connect(f"file:{db_path}", uri=True, check_same_thread=False)
+            conn.executescript(_SCHEMA)
+        if self.overlay:
+            self._attach_base(conn)
+        return conn
+
+    def _attach_base(self, conn):
+        """Attach the base database read-only and shadow its tables with base + delta views."""
+        conn.execute("ATTACH DATABASE ? AS base", (f"file:{os.path.join(self.path, CHUNK_DB_FILE)}?mode=ro",))
+        if not self.read_only:
+            conn.executescript(_DELTA_SCHEMA)
+            if conn.execute("SELECT 1 FROM main.base_info").fetchone() is None:
+                # a new delta: its ids continue after the base's
+                conn.execute("INSERT INTO main.base_info (chunks) SELECT COUNT(*) FROM base.chunks")
+                conn.execute(
+                    "INSERT INTO main.sqlite_sequence (name, seq) "
+                    "SELECT 'chunks', (SELECT COALESCE(MAX(seq), 0) FROM base.sqlite_sequence WHERE name = 'chunks') "
+                    "WHERE NOT EXISTS (SELECT 1 FROM main.sqlite_sequence WHERE name = 'chunks')"
+                )
+                conn.commit()
+        self._base_tables = {row[0] for row in conn.execute("SELECT name FROM base.sqlite_master WHERE type = 'table'")}
+        for table in _OVERLAID_TABLES:
+            if table in self._base_tables:
+                conn.execute(
+                    f"CREATE TEMP VIEW {table} AS SELECT * FROM base.{table} WHERE id NOT IN (SELECT id FROM main.removed_ids) "
+                    f"UNION ALL SELECT * FROM main.{table}"
+                )
+        if "deleted_ids" in self._base_tables:
+            conn.execute("CREATE TEMP VIEW deleted_ids AS SELECT id FROM base.deleted_ids UNION ALL SELECT id FROM main.deleted_ids")
+        if "term_stats" in self._base_tables:
+            # the delta holds signed changes of df
+            conn.execute(
+                "CREATE TEMP VIEW term_stats AS "
+                "SELECT term, df FROM base.term_stats WHERE term NOT IN (SELECT term FROM main.term_stats) "
+                "UNION ALL SELECT d.term, d.df + COALESCE((SELECT b.df FROM base.term_stats b WHERE b.term = d.term), 0) "
+                "FROM main.term_stats d"
+            )
+
+    @property
+    def conn(self):
+        """The writer's connection, or one read-only connection per thread."""
+        if self._write_conn is not None:
+            return self._write_conn
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+
+    @property
+    def ntotal(self):
+        return self.index.ntotal
+
+    @property
+    def dim(self):
+        return self.index.d
+
+    # --- writing -----------------------------------------------------------
+    def add_chunks(self, chunks, vectors):
+        """Insert chunk rows and their vectors. Returns the new ids."""
+        if not chunks:
+            return np.zeros(0, dtype=np.int64)
+        ids = []
+        for chunk in chunks:
+            cursor = self.conn.execute(
+                "INSERT INTO main.chunks (chunk_id, source_file, file_name, page_content, metadata) VALUES (?, ?, ?, ?, ?)",
+                (
+                    chunk.metadata["chunk_id"],
+                    chunk.metadata.get("source_file", ""),
+                    chunk.metadata.get("file_name", "Unknown"),
+                    chunk.page_content,
+                    json.dumps(chunk.metadata),
+                ),
+            )
+            ids.append(cursor.lastrowid)
+        self._index_terms(zip(ids, (chunk.page_content for chunk in chunks)))
+        ids = np.asarray(ids, dtype=np.int64)
+        self.index.add_with_ids(np.ascontiguousarray(vectors, dtype=np.float32), ids)
+        self._index_dirty = True
+        return ids
+
+    def _delete_rows(self, source_files):
+        """Delete the chunk rows of the given files, returning their ids."""
+        source_files = list(source_files)
+        ids = np.concatenate([np.zeros(0, dtype=np.int64), *self.ids_for_files(source_files).values()])
+        self._unindex_terms(ids)
+        for start in range(0, len(source_files), SQLITE_MAX_VARIABLES):
+            batch = source_files[start:start + SQLITE_MAX_VARIABLES]
+            placeholders = ','.join('?' * len(batch))
+            if self.overlay:
+                self.conn.execute(
+                    f"INSERT OR IGNORE INTO main.removed_ids (id) SELECT id FROM base.chunks WHERE source_file IN ({placeholders})", batch
+                )
+            self.conn.execute(f"DELETE FROM main.chunks WHERE source_file IN ({placeholders})", batch)
+        return ids
+
+    def delete_files(self, source_files):
+        """Remove every chunk of the given files, vectors included. Returns the removed ids."""
+        ids = self._delete_rows(source_files)
+        if len(ids):
+            self.index.remove_ids(ids)
+            self._index_dirty = True
+        return ids
+
+    def tombstone_files(self, source_files):
+        """Remove the given files' chunk rows and tombstone their vectors (SQLite only).
+
+        Returns the number of chunks removed.
+        """
+        ids = self._delete_rows(source_files)
+        self.conn.executemany("INSERT OR IGNORE INTO main.deleted_ids (id) VALUES (?)", [(int(i),) for i in ids])
+        return len(ids)
+
+    def _index_terms(self, rows):
+        """Add (id, text) rows to the inverted index."""
+        df = Counter()
+        for chunk_row_id, text in rows:
+            counts, length = term_counts(text)
+            self.conn.executemany(
+                "INSERT INTO main.postings (term, id, tf) VALUES (?, ?, ?)",
+                [(term, chunk_row_id, tf) for term, tf in counts.items()],
+            )
+            self.conn.execute("INSERT INTO main.chunk_lengths (id, length) VALUES (?, ?)", (chunk_row_id, length))
+            df.update(counts.keys())
+        self._add_document_frequencies(df.items())
+
+    def _add_document_frequencies(self, changes):
+        """Add (term, change of df) to term_stats; in the delta, df is the change itself."""
+        self.conn.executemany(
+            "INSERT INTO main.term_stats (term, df) VALUES (?, ?) ON CONFLICT(term) DO UPDATE SET df = df + excluded.df",
+            changes,
+        )
+
+    def _unindex_terms(self, ids):
+        """Remove the given chunk ids from the inverted index."""
+        ids = [int(i) for i in ids]
+        df = Counter()
+        for start in range(0, len(ids), SQLITE_MAX_VARIABLES):
+            batch = ids[start:start + SQLITE_MAX_VARIABLES]
+            placeholders = ','.join('?' * len(batch))
+            df.update(row[0] for row in self.conn.execute(f"SELECT term FROM postings WHERE id IN ({placeholders})", batch))
+            # rows of the base are hidden by removed_ids instead (see _delete_rows)
+            self.conn.execute(f"DELETE FROM main.postings WHERE id IN ({placeholders})", batch)
+            self.conn.execute(f"DELETE FROM main.chunk_lengths WHERE id IN ({placeholders})", batch)
+        self._add_document_frequencies([(term, -n) for term, n in df.items()])
+        terms = list(df)
+        for start in range(0, len(terms), SQLITE_MAX_VARIABLES):
+            batch = terms[start:start + SQLITE_MAX_VARIABLES]
+            self.conn.execute(f"DELETE FROM main.term_stats WHERE df = 0 AND term IN ({','.join('?' * len(batch))})", batch)
+
+    def index_missing_terms(self):
+        """Add chunks written before the inverted index existed to it. Returns how many."""
+        if self.overlay and "chunk_lengths" not in self._base_tables:
+            self.merge_delta()  # backfill the base itself rather than copying its postings into the delta
+        rows = self.conn.execute(
+            "SELECT id, page_content FROM chunks WHERE id NOT IN (SELECT id FROM chunk_lengths)"
+        ).fetchall()
+        self._index_terms(rows)
+        return len(rows)
+
+    def tombstone_count(self):
+        return self.conn.execute("SELECT COUNT(*) FROM deleted_ids").fetchone()[0]
+
+    def compact(self):
+        """Purge tombstoned vectors from the index. Returns the removed ids."""
+        if self.overlay and "deleted_ids" in self._base_tables and self.conn.execute("SELECT 1 FROM base.deleted_ids LIMIT 1").fetchone():
+            self.merge_delta()  # tombstones recorded in the base can only be cleared in a new one
+        ids = np.asarray([row[0] for row in self.conn.execute("SELECT id FROM deleted_ids")], dtype=np.int64)
+        if not len(ids):
+            return ids
+        self.index.remove_ids(ids)
+        self.conn.execute("DELETE FROM main.deleted_ids")
+        self._index_dirty = True
+        return ids
+
+    def save(self):
+        """Write the index if it changed (temp file + rename), then commit the chunk rows.
+
+        Folds the delta into the base once it outgrew DELTA_MERGE_FRACTION.
+        """
+        if self._index_dirty:
+            index_path = os.path.join(self.path, INDEX_FILE)
+            faiss.write_index(self.index, index_path + ".tmp")
+            os.replace(index_path + ".tmp", index_path)
+            self._index_dirty = False
+        self.conn.commit()
+        if self.db_file != CHUNK_DB_FILE:
+            # a freshly created store: move its database over the old one, whose delta is void
+            self._write_conn.close()
+            delta_path = os.path.join(self.path, CHUNK_DELTA_FILE)
+            if os.path.exists(delta_path):
+                os.remove(delta_path)
+            os.replace(os.path.join(self.path, self.db_file), os.path.join(self.path, CHUNK_DB_FILE))
+            self.db_file = CHUNK_DB_FILE
+            self._write_conn = self._connect()
+        elif self.overlay and self._delta_rows() > DELTA_MERGE_FRACTION * max(self._base_rows(), 1):
+            self.merge_delta()
+
+    def _delta_rows(self):
+        return self.conn.execute("SELECT (SELECT COUNT(*) FROM main.chunks) + (SELECT COUNT(*) FROM main.removed_ids)").fetchone()[0]
+
+    def _base_rows(self):
+        return self.conn.execute("SELECT chunks FROM main.base_info").fetchone()[0]
+
+    def merge_delta(self):
+        """Write a new base: a copy of chunks.sqlite with the delta applied, then drop the delta.
+
+        O(store), unlike every other write; the base shared with older
+        generations is replaced by rename, never written.
+        """
+        self.conn.commit()
+        self._write_conn.close()
+        base_path = os.path.join(self.path, CHUNK_DB_FILE)
+        merged_path = base_path + ".merge"
+        if os.path.exists(merged_path):
+            os.remove(merged_path)
+        copy_database(base_path, merged_path)
+        conn = sqlite3.connect(merged_path)
+        try:
+            conn.executescript(_SCHEMA)  # a base written before the inverted index existed
+            conn.execute("ATTACH DATABASE ? AS delta", (os.path.join(self.path, CHUNK_DELTA_FILE),))
+            conn.executescript(_MERGE_DELTA)
+        finally:
+            conn.close()
+        os.replace(merged_path, base_path)
+        os.remove(os.path.join(self.path, CHUNK_DELTA_FILE))
+        self.overlay = False
+        self._base_tables = set()
+        self._write_conn = self._connect()
+
+    # --- reading -----------------------------------------------------------
+    def search(self, queries, k):
+        """FAISS search; returns (squared L2 distances, chunk ids) like index.search."""
+        return self.index.search(np.ascontiguousarray(queries, dtype=np.float32), k)
+
+    def reconstruct(self, ids):
+        """Stored vectors for the given chunk ids."""
+        return self.index.reconstruct_batch(np.asarray(ids, dtype=np.int64))
+
+    def fetch(self, ids):
+        """Load the Documents for the given chunk ids as {id: Document}."""
+        ids = [int(i) for i in ids]
+        docs = {}
+        for start in range(0, len(ids), SQLITE_MAX_VARIABLES):
+            batch = ids[start:start + SQLITE_MAX_VARIABLES]
+            rows = self.conn.execute(
+                f"SELECT id, page_content, metadata FROM chunks WHERE id IN ({','.join('?' * len(batch))})", batch
+            )
+            for chunk_row_id, page_content, metadata in rows:
+                docs[chunk_row_id] = Document(page_content=page_content, metadata=json.loads(metadata))
+        return docs
+
+    def sections(self, ids):
+        """CV sections of the given chunk ids as {id: [section, ...]} (see cv_chunker)."""
+        return {chunk_row_id: chunk_sections(doc.metadata) for chunk_row_id, doc in self.fetch(ids).items()}
+
+    def ids_for_files(self, source_files):
+        """Map each given source_file to the ids of its chunks."""
+        source_files = list(source_files)
+        ids = {}
+        for start in range(0, len(source_files), SQLITE_MAX_VARIABLES):
+            batch = source_files[start:start + SQLITE_MAX_VARIABLES]
+            rows = self.conn.execute(
+                f"SELECT source_file, id FROM chunks WHERE source_file IN ({','.join('?' * len(batch))})", batch
+            )
+            for source_file, chunk_row_id in rows:
+                ids.setdefault(source_file, []).append(chunk_row_id)
+        return {source_file: np.asarray(file_ids, dtype=np.int64) for source_file, file_ids in ids.items()}
+
+    def count_chunks(self, source_files):
+        """Number of chunks of the given files."""
+        source_files = list(source_files)
+        total = 0
+        for start in range(0, len(source_files), SQLITE_MAX_VARIABLES):
+            batch = source_files[start:start + SQLITE_MAX_VARIABLES]
+            total += self.conn.execute(
+                f"SELECT COUNT(*) FROM chunks WHERE source_file IN ({','.join('?' * len(batch))})", batch
+            ).fetchone()[0]
+        return total
+
+    # --- keyword search ----------------------------------------------------
+    def lexical_stats(self):
+        """{complete, chunks, avg_length} of the inverted index.
+
+        complete is False for a store written before the index existed (or
+        not fully backfilled yet, see index_missing_terms).
+        """
+        has_index = self.conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'chunk_lengths'").fetchone()
+        if not has_index:
+            return {"complete": False, "chunks": 0, "avg_length": 0.0}
+        indexed, avg_length = self.conn.execute("SELECT COUNT(*), AVG(length) FROM chunk_lengths").fetchone()
+        total = self.conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+        return {"complete": indexed == total, "chunks": indexed, "avg_length": avg_length or 0.0}
+
+    def document_frequencies(self, terms):
+        """{term: number of chunks containing it} for the given terms (0 if none)."""
+        terms = list(dict.fromkeys(terms))
+        df = dict.fromkeys(terms, 0)
+        for start in range(0, len(terms), SQLITE_MAX_VARIABLES):
+            batch = terms[start:start + SQLITE_MAX_VARIABLES]
+            df.update(self.conn.execute(f"SELECT term, df FROM term_stats WHERE term IN ({','.join('?' * len(batch))})", batch))
+        return df
+
+    def chunks_with_phrase(self, phrase, within_files=None):
+        """Ids of the chunks containing phrase (a list of words), optionally only chunks of within_files.
+
+        The rarest word is looked up first and the others only among its
+        chunks, so the cost follows the rarest word. Multi-word phrases are
+        checked against the chunk text.
+        """
+        words = sorted(set(phrase), key=self.document_frequencies(phrase).get)
+        if within_files is None:
+            ids = [row[0] for row in self.conn.execute("SELECT id FROM postings WHERE term = ?", (words[0],))]
+        else:
+            within_files = list(within_files)
+            ids = []
+            for start in range(0, len(within_files), SQLITE_MAX_VARIABLES):
+                batch = within_files[start:start + SQLITE_MAX_VARIABLES]
+                ids.extend(row[0] for row in self.conn.execute(
+                    "SELECT p.id FROM postings p JOIN chunks c ON c.id = p.id "
+                    f"WHERE p.term = ? AND c.source_file IN ({','.join('?' * len(batch))})", [words[0], *batch]
+                ))
+        for word in words[1:]:
+            found = []
+            for start in range(0, len(ids), SQLITE_MAX_VARIABLES):
+                batch = ids[start:start + SQLITE_MAX_VARIABLES]
+                found.extend(row[0] for row in self.conn.execute(
+                    f"SELECT id FROM postings WHERE term = ? AND id IN ({','.join('?' * len(batch))})", [word, *batch]
+                ))
+            ids = found
+        if len(phrase) > 1 and ids:
+            docs = self.fetch(ids)
+            ids = [i for i in ids if i in docs and contains_phrase(tokenize(docs[i].page_content), phrase)]
+        return ids
+
+    def files_for_ids(self, ids):
+        """Distinct source_files of the given chunk ids."""
+        ids = [int(i) for i in ids]
+        files = set()
+        for start in range(0, len(ids), SQLITE_MAX_VARIABLES):
+            batch = ids[start:start + SQLITE_MAX_VARIABLES]
+            files.update(row[0] for row in self.conn.execute(
+                f"SELECT DISTINCT source_file FROM chunks WHERE id IN ({','.join('?' * len(batch))})", batch
+            ))
+        return files
+
+    def files_with_phrases(self, phrases, require_all=True):
+        """source_files mentioning all (or, with require_all=False, any) of the phrases.
+
+        For require_all the rarest phrase goes first and each further one is
+        only looked up in the files still in the running, so the more
+        selective the phrases the less is read.
+        """
+        phrases = sorted(phrases, key=lambda phrase: min(self.document_frequencies(phrase).values()))
+        files = None if require_all else set()
+        for phrase in phrases:
+            found = self.files_for_ids(self.chunks_with_phrase(phrase, within_files=files if require_all else None))
+            if not require_all:
+                files |= found
+                continue
+            files = found
+            if not files:
+                break
+        return files or set()
+
+    def bm25_scores(self, ids, terms, n_chunks, avg_length):
+        """{id: BM25 score} of the given chunk ids for the query terms (n_chunks / avg_length: lexical_stats)."""
+        idfs = {term: idf(df, n_chunks) for term, df in self.document_frequencies(terms).items() if df}
+        ids = [int(i) for i in ids]
+        term_freqs = {i: {} for i in ids}
+        lengths = {}
+        terms = list(idfs)
+        for start in range(0, len(ids), SQLITE_MAX_VARIABLES // 2):
+            batch = ids[start:start + SQLITE_MAX_VARIABLES // 2]
+            placeholders = ','.join('?' * len(batch))
+            lengths.update(self.conn.execute(f"SELECT id, length FROM chunk_lengths WHERE id IN ({placeholders})", batch))
+            for term_start in range(0, len(terms), SQLITE_MAX_VARIABLES // 2):
+                term_batch = terms[term_start:term_start + SQLITE_MAX_VARIABLES // 2]
+                rows = self.conn.execute(
+                    f"SELECT id, term, tf FROM postings WHERE term IN ({','.join('?' * len(term_batch))}) AND id IN ({placeholders})",
+                    [*term_batch, *batch],
+                )
+                for chunk_row_id, term, tf in rows:
+                    term_freqs[chunk_row_id][term] = tf
+        return {i: bm25(term_freqs[i], lengths.get(i, 0), idfs, avg_length) for i in ids}
+
+    def all_files(self):
+        return [row[0] for row in self.conn.execute("SELECT DISTINCT source_file FROM chunks")]
+
+    def close(self):
+        if self._write_conn is not None:
+            self._write_conn.close()
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
@@ -1,61 +1,613 @@
 import os
-from langchain_community.embeddings import HuggingFaceEmbeddings
-from langchain_community.vectorstores import FAISS
+import logging
+import threading
+import numpy as np
+import faiss
+
+from app.ann_index import load_ann_index, ann_deleted_ids, ANN_META_FILE
+from app.chunk_store import ChunkStore, INDEX_FILE, CHUNK_DB_FILE, DEFAULT_SECTION, chunk_sections
+from app.embedding_batcher import EmbeddingBatcher
+from app.generations import current_store_path, pin
+from app import query_cache
+from app.lexical_index import parse_phrase, query_terms
+from app.embedding_backends import get_embedding_model, EMBEDDING_BACKEND
+from app.metrics import stage_timer, set_index_size
 
 # === CONFIGURATIONS ===
 VECTOR_DB_PATH = "cv_vectorstore"  # Path to your FAISS vector store
 EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
 TOP_K = 20  # retrieve top 20 chunks before grouping
+FILE_SUMMARY_FILE = "file_summaries.npz"  # per-file summary vectors written by embed_folder
+CANDIDATE_FACTOR = 4  # CV-level mode: files shortlisted per requested result
+MIN_CANDIDATES = 50  # ... but never fewer than this
+SECTION_FETCH_FACTOR = 4  # section-restricted / weighted searches fetch this many times more chunk hits
+FUSION_FETCH_FACTOR = 3  # lexical fusion re-ranks this many times more vector candidates
+SCAN_BLOCK_SIZE = 65536  # chunk vectors compared at once when scanning a keyword-filtered subset
+
+# Matched text of every hit is only logged at DEBUG level (LOG_LEVEL=DEBUG)
+logger = logging.getLogger(__name__)
+
+# === Process-wide cache of the embedding model and vector store ===
+# The model is loaded once per process. The store is loaded once and reloaded
+# only when a new generation is published (e.g. after embed_folder ran);
+# requests already running finish on the generation they started with.
+_cache_lock = threading.Lock()
+_embeddings = None
+_vectorstore = None
+_vectorstore_version = None
+_index_state = None  # search structures built alongside _vectorstore, see _build_index_state
+_batcher = None
+
+
+def get_embeddings():
+    """Return the shared embedding model, loading it on first use."""
+    global _embeddings
+    if _embeddings is None:
+        with _cache_lock:
+            if _embeddings is None:
+                logger.info("Loading embedding model: %s (%s)", EMBEDDING_MODEL, EMBEDDING_BACKEND)
+                _embeddings = get_embedding_model(model_name=EMBEDDING_MODEL)
+    return _embeddings
+
+
+def get_batcher():
+    """Return the shared micro-batching query embedder."""
+    global _batcher
+    if _batcher is None:
+        embeddings = get_embeddings()
+        with _cache_lock:
+            if _batcher is None:
+                _batcher = EmbeddingBatcher(embeddings.embed_documents)
+    return _batcher
+
+
+def embed_query(text):
+    """Embed one job description; concurrent callers are encoded together in one batch.
+
+    Vectors are cached by (model, normalized text), so a repeated job
+    description is not encoded again.
+    """
+    text = query_cache.normalize_text(text)
+    model = (EMBEDDING_MODEL, EMBEDDING_BACKEND)
+    vector = query_cache.get_embedding(model, text)
+    if vector is not None:
+        return vector
+    batcher = get_batcher()
+    with stage_timer("query_embed"):
+        vector = batcher.embed(text)
+    query_cache.put_embedding(model, text, vector)
+    return vector
+
+
+def embed_many(texts):
+    """Embed several job descriptions in one encode pass, skipping those in the embedding cache."""
+    texts = [query_cache.normalize_text(text) for text in texts]
+    model = (EMBEDDING_MODEL, EMBEDDING_BACKEND)
+    vectors = [query_cache.get_embedding(model, text) for text in texts]
+    missing = [i for i, vector in enumerate(vectors) if vector is None]
+    if missing:
+        embeddings = get_embeddings()
+        with stage_timer("query_embed"):
+            encoded = embeddings.embed_documents([texts[i] for i in missing])
+        for i, vector in zip(missing, encoded):
+            vectors[i] = vector
+            query_cache.put_embedding(model, texts[i], vector)
+    return np.asarray(vectors, dtype=np.float32)
+
+
+def results_key(job_description, n_results, sections, section_weights, index_state,
+                must_have=None, exclude=None, lexical_weight=0.0):
+    """Result-cache key: the query, its search parameters and the version of the store searched."""
+    return query_cache.make_key(
+        query_cache.normalize_text(job_description), n_results, sorted(sections or []), section_weights or {},
+        sorted(must_have or []), sorted(exclude or []), lexical_weight,
+        EMBEDDING_MODEL, EMBEDDING_BACKEND, index_state["version"],
+    )
+
+
+def _store_version():
+    """(current generation folder, mtime + size of its files), None if there is no store.
+
+    Generations never change once published, the stat part only matters
+    for a store written before generations existed.
+    """
+    store_path = current_store_path(VECTOR_DB_PATH)
+    version = [store_path]
+    for name in (INDEX_FILE, CHUNK_DB_FILE, FILE_SUMMARY_FILE, ANN_META_FILE):
+        try:
+            st = os.stat(os.path.join(store_path, name))
+        except FileNotFoundError:
+            if name in (FILE_SUMMARY_FILE, ANN_META_FILE):  # optional
+                version.append(None)
+                continue
+            return None
+        version.append((st.st_mtime_ns, st.st_size))
+    return tuple(version)
+
+
+def _build_index_state(vectorstore):
+    """Build the search structures for a freshly loaded store.
+
+    ann_index is the ANN index built by embed_folder (None for a flat store);
+    ann_deleted lists ids it still holds whose vectors left the store (hnsw).
+    The summary index holds one vector per file (written by embed_folder);
+    without it every file is a candidate in the CV-level mode.
+    """
+    summary_index, summary_files = None, []
+    summary_path = os.path.join(vectorstore.path, FILE_SUMMARY_FILE)
+    if os.path.exists(summary_path):
+        saved = np.load(summary_path)
+        summary_files = saved["files"].tolist()
+        summary_index = faiss.IndexFlatIP(vectorstore.dim)
+        summary_index.add(np.ascontiguousarray(saved["vectors"], dtype=np.float32))
+    else:
+        logger.warning("No %s; CV-level search will scan every file. Re-run embed_folder to build it.", FILE_SUMMARY_FILE)
+    ann_index = load_ann_index(vectorstore.path, vectorstore.ntotal)
+    lexical = vectorstore.lexical_stats()
+    if not lexical["complete"]:
+        logger.warning("Keyword index is incomplete; keyword filters are disabled. Re-run embed_folder to build it.")
+    return {
+        "ann_index": ann_index,
+        "ann_deleted": ann_deleted_ids(vectorstore.path) if ann_index is not None else np.zeros(0, dtype=np.int64),
+        "lexical": lexical,
+        "tombstones": vectorstore.tombstone_count(),
+        "summary_index": summary_index,
+        "summary_files": summary_files,
+    }
+
 
 # === Load the vector store ===
 def load_vectorstore():
-    """Load the vector store from the specified path."""
-    print(f"[INFO] Loading vector store from: {VECTOR_DB_PATH}")
-    embeddings = HuggingFaceEmbeddings(
-        model_name=EMBEDDING_MODEL,
-        model_kwargs={"device": "cpu"},
-        encode_kwargs={"normalize_embeddings": True},
-    )
+    """Return the cached vector store, (re)loading it if the files on disk changed.
 
-    vectorstore = FAISS.load_local(
-        VECTOR_DB_PATH,
-        embeddings,
-        allow_dangerous_deserialization=True
-    )
-    print("[INFO] Vector store loaded successfully.")
+    Returns None if there is no store yet. Only the FAISS index is mapped;
+    chunk text and metadata stay in SQLite until a hit needs them.
+    """
+    global _vectorstore, _vectorstore_version, _index_state
+    version = _store_version()
+    if _vectorstore is not None and version == _vectorstore_version:
+        pin(_vectorstore.path)
+        return _vectorstore
+    if version is None:
+        logger.info("No vector store at %s. Upload CVs first.", VECTOR_DB_PATH)
+        return None
+
+    with _cache_lock:
+        # another request may have reloaded it while we were waiting
+        if _vectorstore is not None and version == _vectorstore_version:
+            return _vectorstore
+
+        store_path = version[0]
+        logger.info("Loading vector store from: %s", store_path)
+        with stage_timer("vector_store_load"):
+            pin(store_path)
+            vectorstore = ChunkStore.open(store_path)
+            if vectorstore is None:
+                logger.info("No vector store at %s. Upload CVs first.", VECTOR_DB_PATH)
+                return None
+            index_state = _build_index_state(vectorstore)
+            index_state["version"] = version
+        # swap in one step; requests already holding the old store keep using it
+        _vectorstore, _index_state, _vectorstore_version = vectorstore, index_state, version
+        query_cache.clear_results()  # keyed by version, so only memory is freed here
+        set_index_size(vectorstore.ntotal, len(index_state["summary_files"]), store_path)
+        logger.info("Vector store loaded successfully.")
     return vectorstore
 
-# === Compare job description with stored CVs ===
-def compare_with_job_description(job_description: str):
-    vectorstore = load_vectorstore()
 
-    print("[INFO] Searching for similar CVs to the job description...")
-    results_with_scores = vectorstore.similarity_search_with_score(job_description, k=TOP_K)
+def load_index_state():
+    """Return the (vectorstore, index state) pair, loading both if needed."""
+    load_vectorstore()
+    with _cache_lock:
+        return _vectorstore, _index_state
 
-    if not results_with_scores:
-        print("[INFO] No similar CVs found.")
-        return []
 
-    # Group by file_name and keep only best (lowest score) per file
+def warm_up():
+    """Load the model and (if it exists) the vector store ahead of the first request."""
+    get_embeddings()
+    if _store_version() is None:
+        logger.info("No vector store at %s yet, skipping warm-up.", VECTOR_DB_PATH)
+        return
+    load_vectorstore()
+
+# === Section filters ===
+def section_weight(chunk_sections, sections=None, section_weights=None):
+    """Weight of a chunk with the given CV sections, or None if the filter excludes it.
+
+    sections restricts matches to chunks holding one of those sections;
+    section_weights ({section: weight}, default 1) divides a chunk's distance
+    by its best section weight, so weight 2 makes skills hits rank as if
+    twice as close.
+    """
+    if sections and not set(chunk_sections) & set(sections):
+        return None
+    if not section_weights:
+        return 1.0
+    return max(section_weights.get(section, 1.0) for section in chunk_sections)
+
+
+def validate_section_weights(section_weights):
+    for section, weight in (section_weights or {}).items():
+        if weight <= 0:
+            raise ValueError(f"Section weight for {section!r} must be positive")
+
+
+# === Keyword filters ===
+def keyword_filter(vectorstore, index_state, must_have=None, exclude=None):
+    """Which files a search may return, from must-have and exclude keywords; None without any.
+
+    must_have keeps files mentioning every term, exclude drops files
+    mentioning any; a term of several words ("machine learning") must
+    occur as a phrase. Resolved on the inverted index before any vector is
+    compared. Returns {"files", "excluded", "ids", "skipped_chunks"}: files
+    is the set of allowed source files (None = all but excluded); ids holds
+    their chunk ids when they are at most half of the store, which is then
+    scanned directly instead of searched (see search_chunks).
+    """
+    if not must_have and not exclude:
+        return None
+    if not index_state["lexical"]["complete"]:
+        raise ValueError("Keyword filters need the keyword index; re-run embed_folder to build it")
+    must_have = [parse_phrase(term) for term in must_have or []]
+    exclude = [parse_phrase(term) for term in exclude or []]
+
+    excluded = vectorstore.files_with_phrases(exclude, require_all=False) if exclude else set()
+    live_chunks = vectorstore.ntotal - index_state["tombstones"]
+    if not must_have:
+        return {"files": None, "excluded": excluded, "ids": None, "skipped_chunks": vectorstore.count_chunks(excluded)}
+
+    files = vectorstore.files_with_phrases(must_have) - excluded
+    ids_by_file = vectorstore.ids_for_files(files)
+    ids = np.concatenate([np.zeros(0, dtype=np.int64), *ids_by_file.values()])
+    selective = len(ids) * 2 <= live_chunks
+    return {
+        "files": files, "excluded": excluded, "ids": ids if selective else None,
+        "skipped_chunks": live_chunks - len(ids),
+    }
+
+
+def _allowed(file_filter, source_file):
+    if file_filter is None:
+        return True
+    if file_filter["files"] is not None:
+        return source_file in file_filter["files"]
+    return source_file not in file_filter["excluded"]
+
+
+# === Chunk search ===
+def _search_index(vectorstore, index_state, queries, k):
+    """(ids, squared L2 distances) per query from the ANN or flat index, best first."""
+    ann_index = index_state["ann_index"]
+    with stage_timer("faiss_search"):
+        if ann_index is not None:
+            scores, ids = ann_index.search(queries, k)
+        else:
+            scores, ids = vectorstore.search(queries, k)
+
+        ranked = []
+        for query, query_scores, query_ids in zip(queries, scores, ids):
+            keep = query_ids != -1  # fewer hits than k
+            if len(index_state["ann_deleted"]):
+                keep &= ~np.isin(query_ids, index_state["ann_deleted"])  # not in the flat store any more
+            query_ids, query_scores = query_ids[keep], query_scores[keep]
+            if ann_index is not None and len(query_ids):
+                exact = ((vectorstore.reconstruct(query_ids) - query) ** 2).sum(axis=1)
+                order = np.argsort(exact)
+                query_ids, query_scores = query_ids[order], exact[order]
+            ranked.append((query_ids, query_scores))
+    return ranked
+
+
+def _scan_ids(vectorstore, queries, ids, k):
+    """Exact top-k per query over the given chunk ids only, like _search_index."""
+    best = [(np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)) for _ in queries]
+    with stage_timer("faiss_search"):
+        for start in range(0, len(ids), SCAN_BLOCK_SIZE):
+            block = ids[start:start + SCAN_BLOCK_SIZE]
+            vectors = vectorstore.reconstruct(block)
+            for i, query in enumerate(queries):
+                block_ids = np.concatenate([best[i][0], block])
+                distances = np.concatenate([best[i][1], ((vectors - query) ** 2).sum(axis=1)])
+                order = np.argsort(distances)[:k]
+                best[i] = (block_ids[order], distances[order])
+    return best
+
+
+def search_chunks(vectorstore, index_state, query_vectors, k, sections=None, section_weights=None, file_filter=None):
+    """Top-k chunk hits for each query vector as lists of (doc, score).
+
+    Uses the ANN index when there is one and re-scores its hits exactly from
+    the flat store, so scores are squared L2 distances (lower is more similar)
+    whatever the index type. Only the hits' rows are read from SQLite.
+    Vectors of deleted files may still be in the index (tombstones), so we
+    fetch that many extra hits and drop those without a row.
+
+    With sections / section_weights (see section_weight) SECTION_FETCH_FACTOR
+    times more hits are fetched, filtered and re-ranked by weighted score.
+
+    With a file_filter (see keyword_filter) a selective filter is served by
+    comparing the query with the allowed chunks only, so it gets cheaper
+    the fewer files pass. Otherwise the index is searched for twice as many
+    hits, doubling until k allowed ones are found or enough were fetched to
+    be sure there are no more.
+    """
+    queries = np.ascontiguousarray(query_vectors, dtype=np.float32).reshape(-1, vectorstore.dim)
+    wanted = k
+    if sections or section_weights:
+        k *= SECTION_FETCH_FACTOR
+
+    if file_filter is not None and file_filter["ids"] is not None:
+        ranked = _scan_ids(vectorstore, queries, file_filter["ids"], k)
+        docs = vectorstore.fetch(np.unique(np.concatenate([query_ids for query_ids, _ in ranked])))
+    else:
+        stale = index_state["tombstones"] + len(index_state["ann_deleted"])
+        enough = min(k + stale + (file_filter["skipped_chunks"] if file_filter else 0), vectorstore.ntotal + len(index_state["ann_deleted"]))
+        fetch_k = min(k * 2 + stale if file_filter else enough, enough)
+        if fetch_k == 0:
+            return [[] for _ in queries]
+        while True:
+            ranked = _search_index(vectorstore, index_state, queries, fetch_k)
+            docs = vectorstore.fetch(np.unique(np.concatenate([query_ids for query_ids, _ in ranked])))
+            if file_filter is None or fetch_k >= enough:
+                break
+            found = [
+                sum(1 for i in query_ids if int(i) in docs and _allowed(file_filter, docs[int(i)].metadata.get("source_file")))
+                for query_ids, _ in ranked
+            ]
+            if min(found) >= k:
+                break
+            fetch_k = min(fetch_k * 2, enough)
+
+    results = []
+    for query_ids, query_scores in ranked:
+        hits = [(docs[int(i)], float(score)) for i, score in zip(query_ids, query_scores) if int(i) in docs]
+        if file_filter is not None:
+            hits = [(doc, score) for doc, score in hits if _allowed(file_filter, doc.metadata.get("source_file"))]
+        if sections or section_weights:
+            weighted = []
+            for doc, score in hits:
+                weight = section_weight(chunk_sections(doc.metadata), sections, section_weights)
+                if weight is not None:
+                    weighted.append((doc, score / weight))
+            hits = sorted(weighted, key=lambda hit: hit[1])
+        results.append(hits[:wanted])
+    return results
+
+# === Group chunk hits by CV ===
+@stage_timer("grouping")
+def group_by_file(results_with_scores):
+    """Group (doc, score) hits by file_name and keep only best (lowest score) per file."""
     best_by_file = {}
     for doc, score in results_with_scores:
         file_name = doc.metadata.get("file_name", "Unknown")
         if file_name not in best_by_file or score < best_by_file[file_name][1]:
             best_by_file[file_name] = (doc, score)
+    return best_by_file
 
-    print("\n=== TOP MATCHES (Best per CV) ===\n")
-    for i, (file_name, (doc, score)) in enumerate(best_by_file.items(), start=1):
-        print(f"Match #{i}")
-        print(f"File: {file_name}")
-        print(f"Score (lower is more similar): {score:.4f}")
-        print("Matched Text:\n", doc.page_content[:500], "...\n")
-        print("-" * 60)
+# === CV-level (two-stage) retrieval ===
+def top_files(vectorstore, index_state, query_vector, n_results, sections=None, section_weights=None, file_filter=None):
+    """Return the n_results best distinct files for one normalized query vector.
 
-    print(f"[INFO] Found {len(best_by_file)} matching CV(s).")
+    Stage 1 shortlists candidate files by their summary vector (plus the files
+    of the usual top-K chunk hits). Stage 2 computes the exact best chunk
+    distance for each candidate over that candidate's chunks only, so the cost
+    depends on the shortlist, not on the total number of chunks. sections /
+    section_weights filter and weight the chunks of stage 2 (see section_weight).
+    With a selective file_filter (see keyword_filter) the allowed files are
+    the shortlist; otherwise the shortlist is doubled and filtered.
+    """
+    query = np.asarray(query_vector, dtype=np.float32).reshape(1, -1)
+    summary_index = index_state["summary_index"]
+
+    # Stage 1: candidate generation
+    if file_filter is not None and file_filter["ids"] is not None:
+        candidates = set(file_filter["files"])
+    else:
+        if summary_index is not None and summary_index.ntotal:
+            n_candidates = max(n_results * CANDIDATE_FACTOR, MIN_CANDIDATES) * (2 if file_filter else 1)
+            with stage_timer("faiss_search"):
+                _, indices = summary_index.search(query, min(n_candidates, summary_index.ntotal))
+            candidates = {index_state["summary_files"][i] for i in indices[0] if i != -1}
+        else:
+            candidates = set(vectorstore.all_files())
+        candidates = {source for source in candidates if _allowed(file_filter, source)}
+
+        for doc, _ in search_chunks(vectorstore, index_state, query, TOP_K, sections, section_weights, file_filter)[0]:
+            candidates.add(doc.metadata.get("source_file") or doc.metadata.get("file_name", "Unknown"))
+
+    # Stage 2: exact max-similarity (= min squared L2, the flat index's score) per candidate
+    with stage_timer("grouping"):
+        scored = []
+        ids_by_file = vectorstore.ids_for_files(candidates)
+        sections_by_id = None
+        if (sections or section_weights) and ids_by_file:
+            sections_by_id = vectorstore.sections(np.concatenate(list(ids_by_file.values())))
+        for source, ids in ids_by_file.items():
+            distances = ((vectorstore.reconstruct(ids) - query) ** 2).sum(axis=1)
+            if sections_by_id is not None:
+                weights = [section_weight(sections_by_id.get(int(i), [DEFAULT_SECTION]), sections, section_weights) for i in ids]
+                distances = np.array([d / w if w is not None else np.inf for d, w in zip(distances, weights)])
+                if not np.isfinite(distances).any():
+                    continue  # no chunk of this file in the requested sections
+            best = int(np.argmin(distances))
+            scored.append((float(distances[best]), int(ids[best])))
+        scored.sort()
+
+    # Fetch text only for the winners (a few extra in case two files share a name)
+    best_by_file = {}
+    for start in range(0, len(scored), n_results * 2):
+        batch = scored[start:start + n_results * 2]
+        docs = vectorstore.fetch([i for _, i in batch])
+        for score, i in batch:
+            if i not in docs:
+                continue
+            file_name = docs[i].metadata.get("file_name", "Unknown")
+            if file_name not in best_by_file:
+                best_by_file[file_name] = (docs[i], score)
+            if len(best_by_file) == n_results:
+                return best_by_file
     return best_by_file
 
+# === Lexical + vector fusion ===
+def validate_lexical_weight(lexical_weight):
+    if not 0 <= lexical_weight <= 1:
+        raise ValueError("lexical_weight must be between 0 and 1")
+
+
+@stage_timer("lexical_fusion")
+def fuse_lexical(vectorstore, index_state, best_by_file, terms, lexical_weight, n_results=None):
+    """Re-rank vector matches by a blend with their BM25 score for terms.
+
+    A file's lexical score is the BM25 score of its best chunk (any chunk,
+    not only the matched one). Both scores are min-max scaled over the
+    candidates and blended, fused = (1 - w) * distance + w * (1 - bm25), so
+    scores stay "lower is more similar" (now in [0, 1]). The matched doc gets
+    vector_score and lexical_score in its metadata.
+    """
+    if not best_by_file:
+        return best_by_file
+    sources = {file_name: doc.metadata.get("source_file") for file_name, (doc, _) in best_by_file.items()}
+    ids_by_file = vectorstore.ids_for_files(set(sources.values()))
+    ids = np.concatenate([np.zeros(0, dtype=np.int64), *ids_by_file.values()])
+    lexical = index_state["lexical"]
+    chunk_scores = vectorstore.bm25_scores(ids, terms, lexical["chunks"], lexical["avg_length"]) if terms else {}
+
+    lexical_scores = {
+        file_name: max((chunk_scores.get(int(i), 0.0) for i in ids_by_file.get(source, [])), default=0.0)
+        for file_name, source in sources.items()
+    }
+    distances = {file_name: score for file_name, (_, score) in best_by_file.items()}
+    low, high = min(distances.values()), max(distances.values())
+    top_lexical = max(lexical_scores.values()) or 1.0
+    fused = {}
+    for file_name, (doc, distance) in best_by_file.items():
+        scaled_distance = (distance - low) / (high - low) if high > low else 0.0
+        scaled_lexical = lexical_scores[file_name] / top_lexical
+        doc.metadata.update(vector_score=distance, lexical_score=round(lexical_scores[file_name], 4))
+        fused[file_name] = (doc, (1 - lexical_weight) * scaled_distance + lexical_weight * (1 - scaled_lexical))
+    ranked = sorted(fused.items(), key=lambda item: item[1][1])
+    return dict(ranked[:n_results] if n_results else ranked)
+
+
+def _match(vectorstore, index_state, job_description, query_vector, n_results, sections, section_weights,
+           file_filter, must_have, lexical_weight):
+    """best_by_file for one embedded job description (see compare_with_job_description)."""
+    pool = n_results * FUSION_FETCH_FACTOR if n_results and lexical_weight else n_results
+    if n_results:
+        best_by_file = top_files(vectorstore, index_state, query_vector, pool, sections, section_weights, file_filter)
+    else:
+        best_by_file = group_by_file(
+            search_chunks(vectorstore, index_state, query_vector, TOP_K, sections, section_weights, file_filter)[0]
+        )
+    if lexical_weight:
+        terms = list(dict.fromkeys(query_terms(job_description) + [word for term in must_have or [] for word in parse_phrase(term)]))
+        best_by_file = fuse_lexical(vectorstore, index_state, best_by_file, terms, lexical_weight, n_results)
+    return best_by_file
+
+
+# === Compare job description with stored CVs ===
+def compare_with_job_description(job_description: str, n_results: int | None = None,
+                                 sections=None, section_weights=None,
+                                 must_have=None, exclude=None, lexical_weight: float = 0.0):
+    """Return the best chunk per CV for a job description.
+
+    With n_results, the CV-level mode is used and exactly n_results distinct
+    files are returned (or all files, if there are fewer). sections limits the
+    match to those CV sections (e.g. ["skills", "experience"]) and
+    section_weights ({section: weight}) favours some of them.
+    must_have / exclude (lists of keywords or phrases) keep only CVs that
+    mention all / none of them (see keyword_filter), and lexical_weight > 0
+    blends a BM25 keyword score into the ranking (see fuse_lexical).
+    """
+    validate_section_weights(section_weights)
+    validate_lexical_weight(lexical_weight)
+    vectorstore, index_state = load_index_state()
+    if vectorstore is None:
+        return {}
+
+    cache_key = results_key(job_description, n_results, sections, section_weights, index_state, must_have, exclude, lexical_weight)
+    cached = query_cache.get_results(cache_key)
+    if cached is not None:
+        logger.info("Returning %d cached match(es) for the job description.", len(cached))
+        return cached
+
+    file_filter = keyword_filter(vectorstore, index_state, must_have, exclude)
+    if file_filter is not None and file_filter["files"] is not None and not file_filter["files"]:
+        logger.info("No CV mentions all of %s.", must_have)
+        return {}
+
+    logger.info("Searching for similar CVs to the job description...")
+    query_vector = embed_query(job_description)
+    best_by_file = _match(vectorstore, index_state, job_description, query_vector, n_results, sections, section_weights,
+                          file_filter, must_have, lexical_weight)
+
+    if not best_by_file:
+        logger.info("No similar CVs found.")
+        return {}
+
+    if logger.isEnabledFor(logging.DEBUG):
+        for i, (file_name, (doc, score)) in enumerate(best_by_file.items(), start=1):
+            logger.debug("Match #%d %s, score %.4f (lower is more similar):\n%s ...", i, file_name, score, doc.page_content[:500])
+
+    logger.info("Found %d matching CV(s).", len(best_by_file))
+    query_cache.put_results(cache_key, best_by_file)
+    return best_by_file
+
+# === Compare many job descriptions at once ===
+def compare_many_job_descriptions(job_descriptions, n_results: int | None = None,
+                                  sections=None, section_weights=None,
+                                  must_have=None, exclude=None, lexical_weight: float = 0.0):
+    """Match several job descriptions in one encode pass and one FAISS search.
+
+    Returns one best-per-file dict (as compare_with_job_description) per query,
+    in the same order as job_descriptions. The keyword filters and
+    lexical_weight apply to every job description.
+    """
+    validate_section_weights(section_weights)
+    validate_lexical_weight(lexical_weight)
+    if not job_descriptions:
+        return []
+    vectorstore, index_state = load_index_state()
+    if vectorstore is None:
+        return [{} for _ in job_descriptions]
+
+    keys = [
+        results_key(jd, n_results, sections, section_weights, index_state, must_have, exclude, lexical_weight)
+        for jd in job_descriptions
+    ]
+    all_results = [query_cache.get_results(key) for key in keys]
+    missing = [i for i, results in enumerate(all_results) if results is None]
+
+    logger.info("Searching for similar CVs to %d job descriptions (%d cached)...", len(job_descriptions), len(job_descriptions) - len(missing))
+    file_filter = keyword_filter(vectorstore, index_state, must_have, exclude) if missing else None
+    if file_filter is not None and file_filter["files"] is not None and not file_filter["files"]:
+        logger.info("No CV mentions all of %s.", must_have)
+        return [results if results is not None else {} for results in all_results]
+    if missing:
+        vectors = embed_many([job_descriptions[i] for i in missing])
+        if n_results or lexical_weight:
+            computed = [
+                _match(vectorstore, index_state, job_descriptions[i], vector, n_results, sections, section_weights,
+                       file_filter, must_have, lexical_weight)
+                for i, vector in zip(missing, vectors)
+            ]
+        else:
+            computed = [
+                group_by_file(hits)
+                for hits in search_chunks(vectorstore, index_state, vectors, TOP_K, sections, section_weights, file_filter)
+            ]
+        for i, results in zip(missing, computed):
+            all_results[i] = results
+            query_cache.put_results(keys[i], results)
+
+    logger.info("Matched %d job description(s).", len(all_results))
+    return all_results
+
 # === Main run ===
 if __name__ == "__main__":
+    # show every match on the command line
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    logger.setLevel(logging.DEBUG)
     print("Paste the job description below (press Enter when done):")
     print("(Type your job description. When finished, type 'END' on a new line.)")
     job_desc_lines = []
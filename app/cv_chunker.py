@@ -0,0 +1,169 @@
+import os
+import re
+
+from langchain_core.documents import Document
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+# === CONFIGURATIONS ===
+CHUNKER = os.getenv("CHUNKER", "section")  # section | recursive (the generic splitter used before)
+CHUNK_SIZE = 1000  # characters per chunk at most
+CHUNK_OVERLAP = 200  # only used inside sections longer than CHUNK_SIZE
+MIN_CHUNK_SIZE = 300  # a pack of sections shorter than this is topped up with the start of the next section
+MAX_HEADER_LENGTH = 40  # longer lines are never taken for a section header
+
+# Canonical section name -> header spellings (compared lower-cased, without punctuation)
+SECTION_HEADERS = {
+    "summary": ["summary", "professional summary", "profile", "professional profile", "about me", "objective", "career objective", "personal statement"],
+    "experience": ["experience", "work experience", "professional experience", "employment", "employment history", "work history", "career history"],
+    "education": ["education", "academic background", "education and training", "qualifications", "academic qualifications"],
+    "skills": ["skills", "technical skills", "key skills", "core skills", "core competencies", "competencies", "skills and tools", "technologies"],
+    "projects": ["projects", "personal projects", "key projects", "selected projects"],
+    "certifications": ["certifications", "certificates", "licenses and certifications", "courses", "training"],
+    "languages": ["languages"],
+    "awards": ["awards", "honors", "honours", "achievements", "awards and achievements"],
+    "publications": ["publications", "research"],
+    "interests": ["interests", "hobbies", "hobbies and interests"],
+    "references": ["references"],
+}
+HEADER_SECTION = "header"  # text before the first section header: name, contact details
+OTHER_SECTION = "other"  # documents without any recognizable header
+SECTIONS = [HEADER_SECTION, *SECTION_HEADERS, OTHER_SECTION]
+
+_ALIASES = {alias: section for section, aliases in SECTION_HEADERS.items() for alias in aliases}
+_INLINE_HEADER = re.compile(r"^\s*([A-Za-z][A-Za-z &/]{1,%d}?)\s*:\s*(\S.*)$" % MAX_HEADER_LENGTH)
+
+
+def _normalize(line):
+    line = re.sub(r"^[\s#*\-•=_]+|[\s:#*\-•=_]+$", "", line)
+    return re.sub(r"\s+", " ", line.replace("&", "and")).lower()
+
+
+def detect_header(line):
+    """(section, title) if line opens a CV section, else None.
+
+    Matches a header on its own line ("WORK EXPERIENCE", "Skills:") and one
+    followed by content ("Skills: Python, SQL").
+    """
+    if len(line.strip()) <= MAX_HEADER_LENGTH:
+        section = _ALIASES.get(_normalize(line))
+        if section:
+            return section, line.strip().rstrip(":").strip()
+    inline = _INLINE_HEADER.match(line)
+    if inline:
+        section = _ALIASES.get(_normalize(inline.group(1)))
+        if section:
+            return section, inline.group(1).strip()
+    return None
+
+
+def split_sections(text):
+    """Split CV text into [(section, title, text)] at detected section headers.
+
+    The header line stays at the start of its section's text. Without any
+    header the whole text is one OTHER_SECTION.
+    """
+    sections = []
+    section, title, lines = HEADER_SECTION, "", []
+    found = False
+    for line in text.splitlines():
+        header = detect_header(line)
+        if header:
+            found = True
+            if "\n".join(lines).strip():
+                sections.append((section, title, "\n".join(lines).strip()))
+            (section, title), lines = header, [line.strip()]
+        else:
+            lines.append(line)
+    if "\n".join(lines).strip():
+        sections.append((section, title, "\n".join(lines).strip()))
+    if not found:
+        return [(OTHER_SECTION, "", text.strip())] if text.strip() else []
+    return sections
+
+
+def _merge_pages(documents):
+    """One Document per file: sections often run across PDF page breaks."""
+    merged = []
+    for doc in documents:
+        source = doc.metadata.get("source_file")
+        previous = merged[-1] if merged else None
+        if previous is not None and source is not None and previous.metadata.get("source_file") == source:
+            previous.page_content += "\n" + doc.page_content
+            previous.metadata.pop("page", None)
+        else:
+            merged.append(Document(page_content=doc.page_content, metadata=dict(doc.metadata)))
+    return merged
+
+
+def _chunk(doc, pack):
+    """A chunk made of whole sections [(section, title, text)]; its main section is the longest one."""
+    section, title, _ = max(pack, key=lambda entry: len(entry[2]))
+    sections = list(dict.fromkeys(entry[0] for entry in pack))
+    return Document(
+        page_content="\n\n".join(entry[2] for entry in pack),
+        metadata=dict(doc.metadata, section=section, section_title=title, sections=sections),
+    )
+
+
+def _fill(text, room):
+    """(head, rest) of text, head being at most room characters cut at a separator, or None."""
+    head = RecursiveCharacterTextSplitter(chunk_size=room, chunk_overlap=0, length_function=len).split_text(text)[0]
+    if len(head) > room:
+        return None
+    return head, text[text.index(head) + len(head):].strip()
+
+
+def section_chunks(documents, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP, min_chunk_size=MIN_CHUNK_SIZE):
+    """Chunk CVs along their sections, tagging each chunk with its section(s) in metadata.
+
+    Neighbouring sections (contact block, education, languages...) and the
+    tail of a long one are packed into one chunk while they fit, so CVs do
+    not turn into many tiny vectors. A pack is closed at the section that
+    would overflow it, unless it is still shorter than min_chunk_size: then
+    it is filled up with the start of that section (cut at a line or
+    sentence break) and the section continues in the next chunk. Sections
+    longer than chunk_size are split, with chunk_overlap between their parts.
+    metadata["section"] is the chunk's main section, metadata["sections"] all
+    of them.
+    """
+    splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap, length_function=len)
+    chunks = []
+    for doc in _merge_pages(documents):
+        pack, pack_size = [], 0
+        for section, title, text in split_sections(doc.page_content):
+            if pack and pack_size + 2 + len(text) > chunk_size:
+                room = chunk_size - pack_size - 2
+                filled = _fill(text, room) if pack_size < min_chunk_size and room > 0 else None
+                if filled:
+                    head, text = filled
+                    pack.append((section, title, head))
+                chunks.append(_chunk(doc, pack))
+                pack, pack_size = [], 0
+                if not text:
+                    continue
+            if len(text) > chunk_size:
+                # full parts on their own; the (shorter) last part can share a chunk with what follows
+                *parts, text = splitter.split_text(text)
+                chunks.extend(_chunk(doc, [(section, title, part)]) for part in parts)
+            pack.append((section, title, text))
+            pack_size += len(text) + (2 if pack_size else 0)
+        if pack:
+            chunks.append(_chunk(doc, pack))
+    return chunks
+
+
+def recursive_chunks(documents, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP):
+    """The generic splitter: fixed-size chunks with overlap everywhere, no section metadata."""
+    splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap, length_function=len)
+    return splitter.split_documents(documents)
+
+
+CHUNKERS = {"section": section_chunks, "recursive": recursive_chunks}
+
+
+def get_chunker(name=None):
+    """The chunking function for name (default: CHUNKER)."""
+    name = (name or CHUNKER).lower()
+    if name not in CHUNKERS:
+        raise ValueError(f"Unknown CHUNKER {name!r}, expected one of {', '.join(CHUNKERS)}")
+    return CHUNKERS[name]
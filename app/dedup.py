@@ -0,0 +1,77 @@
+import re
+import hashlib
+
+import numpy as np
+
+# === CONFIGURATIONS ===
+NUM_PERM = 128  # MinHash signature length
+SHINGLE_SIZE = 5  # words per shingle
+LSH_BANDS = 16  # 16 bands x 8 rows: pairs above ~0.7 Jaccard almost always share a bucket
+NEAR_DUP_THRESHOLD = 0.85  # estimated Jaccard similarity at which two files are near-duplicates
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+_rng = np.random.RandomState(1)
+# fixed seed: signatures are stored in the manifest and compared across runs
+_PERM_A = _rng.randint(1, np.iinfo(np.int64).max, size=NUM_PERM, dtype=np.int64).astype(np.uint64)
+_PERM_B = _rng.randint(0, np.iinfo(np.int64).max, size=NUM_PERM, dtype=np.int64).astype(np.uint64)
+
+
+# === MinHash signatures ===
+def minhash_signature(text):
+    """MinHash signature (NUM_PERM ints) of the word shingles of a text, or None if it has no words."""
+    words = re.findall(r"\w+", text.lower())
+    if not words:
+        return None
+    shingles = {" ".join(words[i:i + SHINGLE_SIZE]) for i in range(max(1, len(words) - SHINGLE_SIZE + 1))}
+    hashes = np.fromiter(
+        (int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=4).digest(), "little") for s in shingles),
+        dtype=np.uint64,
+        count=len(shingles),
+    )
+    # (a * h + b) mod p, truncated to 32 bits, for every permutation at once;
+    # in blocks so a 300-page PDF does not need a shingles x NUM_PERM matrix
+    signature = np.full(NUM_PERM, _MAX_HASH, dtype=np.uint64)
+    with np.errstate(over="ignore"):
+        for start in range(0, len(hashes), 4096):
+            block = hashes[start:start + 4096]
+            permuted = np.bitwise_and((np.outer(block, _PERM_A) + _PERM_B) % _MERSENNE_PRIME, _MAX_HASH)
+            signature = np.minimum(signature, permuted.min(axis=0))
+    return signature.tolist()
+
+
+def similarity(signature_a, signature_b):
+    """Estimated Jaccard similarity of two signatures."""
+    return float(np.mean(np.asarray(signature_a) == np.asarray(signature_b)))
+
+
+# === LSH index ===
+class MinHashLSH:
+    """Banded LSH over MinHash signatures: finding near-duplicates of a file
+    only compares it with files sharing a band bucket, not with every file."""
+
+    def __init__(self):
+        self.rows = NUM_PERM // LSH_BANDS
+        self.buckets = {}
+        self.signatures = {}
+
+    def _band_keys(self, signature):
+        for band in range(LSH_BANDS):
+            yield band, tuple(signature[band * self.rows:(band + 1) * self.rows])
+
+    def add(self, key, signature):
+        self.signatures[key] = signature
+        for band_key in self._band_keys(signature):
+            self.buckets.setdefault(band_key, []).append(key)
+
+    def query(self, signature, threshold=NEAR_DUP_THRESHOLD):
+        """Return (key, similarity) of the most similar stored file above threshold, or None."""
+        candidates = set()
+        for band_key in self._band_keys(signature):
+            candidates.update(self.buckets.get(band_key, ()))
+        best = None
+        for key in candidates:
+            score = similarity(signature, self.signatures[key])
+            if score >= threshold and (best is None or score > best[1]):
+                best = (key, score)
+        return best
@@ -1,5 +1,11 @@
 import os
 import re
+import json
+import numpy as np
+import signal
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
 from langchain.document_loaders import (
@@ -9,122 +15,677 @@ from langchain.document_loaders import (
     UnstructuredFileLoader,
 )
 
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-
-from langchain.embeddings import HuggingFaceEmbeddings
-from langchain.vectorstores import FAISS
 import hashlib
 
+from app import extract_cache
+from app.ann_index import update_ann_index, ann_index_is_current, load_ann_meta
+from app.chunk_store import ChunkStore
+from app.cv_chunker import get_chunker, CHUNKER
+from app.generations import new_generation, current_store_path
+from app.dedup import MinHashLSH, minhash_signature
+from app.embedding_backends import get_embedding_model, EMBEDDING_BACKEND
+from app.metrics import stage_timer, DOCUMENTS, CHUNKS, FAILURES
+
 # Configurations
 INPUT_FOLDER = "cv_documents" # folder containing your CVs
 VECTOR_DB_PATH = "cv_vectorstore" # path to save the vector store
 SUPPORTED_EXTENSIONS = ['.pdf' , '.docx', '.txt' , '.doc']
 
-os.makedirs(VECTOR_DB_PATH, exist_ok=True)  # Ensure the output directory exists
-os.makedirs(INPUT_FOLDER,exist_ok=True)  # Ensure the input directory exists
-
 EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2" # HuggingFace model for embeddings
+MANIFEST_FILE = "ingest_manifest.json" # per-file ingest state, stored next to the index
+FILE_SUMMARY_FILE = "file_summaries.npz" # one summary vector per file, for CV-level retrieval
+PARSE_WORKERS = int(os.getenv("PARSE_WORKERS", "1")) # >1 parses files in a process pool
+PARSE_TIMEOUT = int(os.getenv("PARSE_TIMEOUT", "120")) # seconds per file (process pool only)
+HASH_BLOCK_SIZE = 1024 * 1024 # read files in 1 MB blocks when fingerprinting
+TOMBSTONE_COMPACT_FRACTION = float(os.getenv("TOMBSTONE_COMPACT_FRACTION", "0.1")) # of the index: delete_file / replace_file compact beyond this
 
+logger = logging.getLogger(__name__)
+
+
+def list_supported_files(folder_path):
+    """ Return all supported files in a folder, in a stable order. """
+    return sorted(
+        file_path for file_path in Path(folder_path).rglob('*')
+        if file_path.is_file() and file_path.suffix.lower() in SUPPORTED_EXTENSIONS
+    )
 
-def load_and_process_documents(folder_path):
-    """ Load and process all documents in a folder. """
+def fingerprint_file(file_path, known=None):
+    """ Fingerprint a file once: {file_hash, file_size, mtime_ns}.
+
+    The file is hashed in fixed-size blocks, never read whole. If `known` (a
+    previous fingerprint, e.g. a manifest entry) has the same size and mtime
+    its hash is reused without reading the file at all.
+    """
+    stat = Path(file_path).stat()
+    if known and known.get("file_size") == stat.st_size and known.get("mtime_ns") == stat.st_mtime_ns:
+        return {"file_hash": known["file_hash"], "file_size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+    md5 = hashlib.md5()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+            md5.update(block)
+    return {"file_hash": md5.hexdigest(), "file_size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+def loader_for(file_path):
+    """ Return the document loader class for a file's type. """
+    # Load based on file type
+    if Path(file_path).suffix.lower() == '.pdf':
+        return PyPDFLoader
+    elif Path(file_path).suffix.lower() == '.docx':
+        return Docx2txtLoader
+    elif Path(file_path).suffix.lower() == '.doc':
+        # Handle .doc files using unstructured
+        return UnstructuredFileLoader
+    else:  # .txt
+        return TextLoader
+
+def attach_file_metadata(documents, file_path, fingerprint):
+    """ Add the file metadata (shared by every page of the file) to its documents. """
+    file_metadata = {
+        "source": str(file_path),
+        "source_file": str(file_path),
+        "file_name": Path(file_path).name,
+        "file_size": fingerprint["file_size"],
+        "file_hash": fingerprint["file_hash"],
+    }
+    for doc in documents:
+        doc.metadata.update(file_metadata)
+    return documents
+
+def parse_file(file_path, fingerprint=None):
+    """ Parse one file with the loader for its type and attach file metadata. """
+    file_path = Path(file_path)
+    if fingerprint is None:
+        fingerprint = fingerprint_file(file_path)
+    logger.info("Processing file: %s", file_path.name)
+
+    # Load the document and add/metadata
+    loaded_docs = loader_for(file_path)(str(file_path)).load()
+    return attach_file_metadata(loaded_docs, file_path, fingerprint)
+
+def _parse_file_with_timeout(file_path, fingerprint, timeout):
+    """ Worker entry point: parse_file, aborted with TimeoutError after `timeout` seconds. """
+    use_alarm = bool(timeout) and hasattr(signal, "SIGALRM")
+    if use_alarm:
+        def on_timeout(signum, frame):
+            raise TimeoutError(f"parsing took longer than {timeout}s")
+        signal.signal(signal.SIGALRM, on_timeout)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        return parse_file(file_path, fingerprint)
+    finally:
+        if use_alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+
+@stage_timer("load")
+def load_and_process_documents(folder_path, files=None, progress=None, workers=None, timeout=None,
+                               fingerprints=None, use_cache=True, cache_stats=None):
+    """ Load and process all documents in a folder (or only the given files).
+
+    fingerprints ({path: fingerprint_file(...)}) lets callers that already
+    hashed the files pass the result in instead of hashing them again.
+
+    With use_cache, files whose content hash is in the extracted-text cache
+    are not parsed at all; cache_stats (a dict) receives hit/miss counts.
+
+    With workers > 1 files are parsed in a process pool, each one limited to
+    `timeout` seconds. Documents are returned in file order either way.
+    progress, if given, is called as progress(stage, done, total, failed_files)
+    before the first file and after each file.
+    """
     documents = []
     failed_files = []
 
-    #Iterate through all files in the folder
-    for file_path in Path(folder_path).rglob('*'):
-        if file_path.is_file() and file_path.suffix.lower() in SUPPORTED_EXTENSIONS:
+    if files is None:
+        files = list_supported_files(folder_path)
+    files = [Path(f) for f in files if Path(f).is_file() and Path(f).suffix.lower() in SUPPORTED_EXTENSIONS]
+    workers = PARSE_WORKERS if workers is None else workers
+    timeout = PARSE_TIMEOUT if timeout is None else timeout
+    fingerprints = dict(fingerprints or {})
+    if cache_stats is None:
+        cache_stats = {}
+    cache_stats.update(hits=0, misses=0)
+
+    # Serve what we can from the extracted-text cache, parse the rest
+    cached = {}
+    if use_cache:
+        for file_path in files:
+            fingerprint = fingerprints.get(str(file_path)) or fingerprint_file(file_path)
+            fingerprints[str(file_path)] = fingerprint
+            cached_docs = extract_cache.get(fingerprint["file_hash"], loader_for(file_path).__name__)
+            if cached_docs is not None:
+                cached[file_path] = attach_file_metadata(cached_docs, file_path, fingerprint)
+        cache_stats.update(hits=len(cached), misses=len(files) - len(cached))
+    to_parse = [file_path for file_path in files if file_path not in cached]
+
+    executor = None
+    futures = {}
+    if workers > 1 and len(to_parse) > 1:
+        # spawn, not fork: we are usually called from the ingest thread of a running server
+        executor = ProcessPoolExecutor(max_workers=min(workers, len(to_parse)), mp_context=multiprocessing.get_context("spawn"))
+        futures = {file_path: executor.submit(_parse_file_with_timeout, str(file_path), fingerprints.get(str(file_path)), timeout) for file_path in to_parse}
+
+    if progress:
+        progress("load", 0, len(files), failed_files)
+    hung = False
+    try:
+        # Collect in submission order so the output is deterministic. Tasks are
+        # dispatched in that order too, so the file we wait on is already
+        # running and timeout (+ a grace period) bounds the wait even if the
+        # in-worker alarm cannot interrupt a stuck C extension.
+        for done, file_path in enumerate(files, start=1):
             try:
-                print(f"Processing file: {file_path.name}")
-
-                # Load based on file type
-                if file_path.suffix.lower() == '.pdf':
-                    loader = PyPDFLoader(str(file_path))
-                elif file_path.suffix.lower() == '.docx':
-                    loader = Docx2txtLoader(str(file_path))
-                elif file_path.suffix.lower() == '.doc':
-                    # Handle .doc files using unstructured
-                    loader = UnstructuredFileLoader(str(file_path))
-                else:  # .txt
-                    loader = TextLoader(str(file_path))
-                
-                # Load the document and add/metadata
-                loaded_docs = loader.load()
-                for doc in loaded_docs:
-                    doc.metadata.update({
-                        "source_file": str(file_path),
-                        "file_name": file_path.name,
-                        "file_size": file_path.stat().st_size,
-                        "file_hash": hashlib.md5(file_path.read_bytes()).hexdigest(),
-                    })
+                if file_path in cached:
+                    loaded_docs = cached[file_path]
+                else:
+                    if executor:
+                        loaded_docs = futures[file_path].result(timeout=timeout + 10 if timeout else None)
+                    else:
+                        loaded_docs = parse_file(file_path, fingerprints.get(str(file_path)))
+                    if use_cache:
+                        extract_cache.put(fingerprints[str(file_path)]["file_hash"], loader_for(file_path).__name__, loaded_docs)
                 documents.extend(loaded_docs)
-
             except Exception as e:
-                print(f"Failed to load {file_path.name}: {e}")
+                if isinstance(e, TimeoutError) and executor:
+                    hung = True
+                logger.warning("Failed to load %s: %r", file_path.name, e)
                 failed_files.append(file_path.name)
-                continue
+            finally:
+                if progress:
+                    progress("load", done, len(files), failed_files)
+    finally:
+        if executor:
+            if hung:
+                # a worker is stuck; shutdown() would wait for it forever
+                for process in list(executor._processes.values()):
+                    process.terminate()
+            executor.shutdown(wait=not hung, cancel_futures=True)
+        if use_cache and to_parse:
+            extract_cache.evict()
 
-    print(f"\n Processed { len(documents)} documents from {len(list(Path(folder_path).rglob('*')))} files.")        
-    print(f"Failed to load {len(failed_files)} files: {', '.join(failed_files)}")
+    DOCUMENTS.inc(len(documents))
+    FAILURES.labels(kind="load").inc(len(failed_files))
+    logger.info("Processed %d documents from %d files.", len(documents), len(files))
+    if failed_files:
+        logger.warning("Failed to load %d files: %s", len(failed_files), ", ".join(failed_files))
+    if use_cache:
+        logger.info("Extracted-text cache: %d hits, %d misses", cache_stats["hits"], cache_stats["misses"])
     return documents , failed_files
 
 #chunk the documents
+@stage_timer("chunk")
 def chunk_documents(documents):
-    """ Split documents into smaller chunks. """
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200 , length_function=len)
-    chunks = text_splitter.split_documents(documents)
-    print(f"Chunked into {len(chunks)} total chunks.")
+    """ Split documents into smaller chunks (along CV sections unless CHUNKER=recursive). """
+    chunks = get_chunker()(documents)
+    CHUNKS.inc(len(chunks))
+    logger.info("Chunked into %d total chunks.", len(chunks))
     return chunks
 
-# generate embeddings
-def generate_embeddings(chunks):
-    """ Generate embeddings for the document chunks. and vector store """
-    embeddings = HuggingFaceEmbeddings(
-        model_name=EMBEDDING_MODEL,
-        model_kwargs={"device": "cpu"},
-        encode_kwargs={"normalize_embeddings": True}
-    )
+def get_embeddings():
+    """ Build the embedding model used for both ingest and query (see EMBEDDING_BACKEND). """
+    return get_embedding_model(model_name=EMBEDDING_MODEL)
 
-    # create unique IDS for each chunk
-    for chunk in chunks:
+def assign_chunk_ids(chunks):
+    """ Give every chunk a stable unique id. """
+    for position, chunk in enumerate(chunks):
         content = chunk.page_content,
         metadata = str(chunk.metadata)
-        unique_id = hashlib.sha256(f"{content}{metadata}".encode()).hexdigest()[:16]
+        unique_id = hashlib.sha256(f"{content}{metadata}{position}".encode()).hexdigest()[:16]
         chunk.metadata["chunk_id"] = unique_id
+    return [chunk.metadata["chunk_id"] for chunk in chunks]
+
+# generate embeddings
+def generate_embeddings(chunks, output_path, vector_store=None, embeddings=None):
+    """ Generate embeddings for the document chunks. and vector store
+
+    When an existing vector store is given the chunks are added to it,
+    otherwise a new store is created at output_path.
+    """
+    if embeddings is None:
+        embeddings = get_embeddings()
+
+    # create unique IDS for each chunk
+    assign_chunk_ids(chunks)
+    with stage_timer("embed"):
+        vectors = embeddings.embed_documents([chunk.page_content for chunk in chunks]) if chunks else []
 
     #create vector store
-    vector_store = FAISS.from_documents(chunks,embeddings)
+    if vector_store is None:
+        dim = len(vectors[0]) if chunks else len(embeddings.embed_query(""))
+        vector_store = ChunkStore.create(output_path, dim)
+    vector_store.add_chunks(chunks, vectors)
     return vector_store
 
-def embed_folder(folder_path , output_path):
-    """ Main function to process the folder and create a vector store. """
-    
-    # Step 1 : Load and process documents
-    raw_documents , failed = load_and_process_documents(folder_path)
+# === Ingest manifest ===
+def load_manifest(output_path):
+    """ Load the ingest manifest ({source_file: {file_hash, chunk_ids}}).
+
+    A manifest written with another embedding model, backend or chunker is
+    ignored (returns {}), so the next embed_folder run re-embeds everything.
+    """
+    manifest_path = os.path.join(output_path, MANIFEST_FILE)
+    if not os.path.exists(manifest_path):
+        return {}
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    built_with = (manifest.get("embedding_model"), manifest.get("embedding_backend", "torch"), manifest.get("chunker", "recursive"))
+    if built_with != (EMBEDDING_MODEL, EMBEDDING_BACKEND, CHUNKER):
+        logger.info("Store was built with %s, now using %s: full rebuild.", built_with, (EMBEDDING_MODEL, EMBEDDING_BACKEND, CHUNKER))
+        return {}
+    return manifest.get("files", {})
+
+def save_manifest(output_path, files):
+    """ Write the ingest manifest atomically. """
+    manifest_path = os.path.join(output_path, MANIFEST_FILE)
+    tmp_path = manifest_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"embedding_model": EMBEDDING_MODEL, "embedding_backend": EMBEDDING_BACKEND, "chunker": CHUNKER, "files": files}, f, indent=2)
+    os.replace(tmp_path, manifest_path)
+
+# === Per-file summary vectors ===
+def save_file_summaries(output_path, vector_store, manifest, refresh):
+    """ Store one normalized mean chunk vector per file (used as a CV-level index).
+
+    Rows of files in `refresh` (or missing from the saved summaries) are
+    recomputed from their chunk vectors, other rows are kept as they are, and
+    rows of files no longer in the manifest are dropped.
+    """
+    summary_path = os.path.join(output_path, FILE_SUMMARY_FILE)
+    existing = {}
+    if os.path.exists(summary_path):
+        saved = np.load(summary_path)
+        existing = dict(zip(saved["files"].tolist(), saved["vectors"]))
+
+    to_compute = [path for path, entry in manifest.items() if entry["chunk_ids"] and (path in refresh or path not in existing)]
+    ids_by_file = vector_store.ids_for_files(to_compute)
+
+    files, vectors = [], []
+    for path, entry in manifest.items():
+        if not entry["chunk_ids"]:
+            continue
+        if path in existing and path not in refresh:
+            vector = existing[path]
+        else:
+            if path not in ids_by_file:
+                continue
+            vector = vector_store.reconstruct(ids_by_file[path]).mean(axis=0)
+            vector = vector / (np.linalg.norm(vector) or 1.0)
+        files.append(path)
+        vectors.append(vector.astype(np.float32))
+
+    dim = vector_store.dim
+    tmp_path = summary_path + ".tmp.npz"
+    np.savez(
+        tmp_path,
+        files=np.array(files, dtype=str),
+        file_names=np.array([Path(path).name for path in files], dtype=str),
+        vectors=np.vstack(vectors) if vectors else np.zeros((0, dim), dtype=np.float32),
+    )
+    os.replace(tmp_path, summary_path)
+
+def duplicate_groups(manifest):
+    """ {canonical file name: [names of the files collapsed onto it]} for the whole manifest. """
+    groups = {}
+    for path, entry in manifest.items():
+        if entry.get("duplicate_of"):
+            groups.setdefault(Path(entry["duplicate_of"]).name, []).append(entry["file_name"])
+    return groups
 
-    #Step 2 : Split documents into chunks
+def load_existing_store(output_path):
+    """ Open the vector store at output_path for writing, or None if there is none yet. """
+    return ChunkStore.open(output_path, read_only=False)
+
+def embed_folder(folder_path , output_path, progress=None, fingerprints=None):
+    """ Main function to process the folder and update the vector store.
+
+    Only new or changed files (by file_hash) are loaded and embedded; their
+    chunks are added to the existing index. Old vectors of changed or removed
+    files are deleted, unchanged files are skipped.
+
+    Duplicates are collapsed onto a canonical (already indexed or earlier)
+    file and not embedded: exact ones by file_hash before parsing, near ones
+    by MinHash/LSH over the extracted text. They are kept in the manifest with
+    duplicate_of, and reported in the summary.
+
+    progress, if given, is called as progress(stage, done, total, failed_files)
+    while the pipeline runs (stages: load, chunk, embed, save, index).
+    fingerprints ({path: fingerprint}), e.g. computed while uploading, are
+    trusted for files whose size and mtime still match.
+
+    The result is written as a new store generation, published only once it
+    is complete (see app.generations); queries keep using the previous one
+    meanwhile.
+    """
+    os.makedirs(output_path, exist_ok=True)
+    with new_generation(output_path) as generation:
+        summary = _update_store(folder_path, generation.path, progress, fingerprints)
+    summary.update(vector_db_path=output_path, generation=generation.name)
+    return summary
+
+def _update_store(folder_path, store_path, progress, fingerprints):
+    """ embed_folder's work, on the generation at store_path (a copy of the current one). """
+    fingerprints = fingerprints or {}
+    embeddings = get_embeddings()
+    get_chunker()  # an unknown CHUNKER fails here, not after every file was parsed
+
+    # Without a manifest we cannot tell which vectors belong to which file,
+    # so the first run (or a run over a pre-manifest store) is a full rebuild
+    manifest = load_manifest(store_path)
+    vector_store = load_existing_store(store_path) if manifest else None
+    if vector_store is None:
+        manifest = {}
+    elif vector_store.index_missing_terms():
+        vector_store.save()  # keyword index of a store written before it existed
+
+    # Step 1 : Work out which files are new, changed, unchanged or gone
+    #          (files whose size and mtime match the manifest are not re-hashed)
+    current = {
+        str(file_path): fingerprint_file(file_path, known=fingerprints.get(str(file_path)) or manifest.get(str(file_path)))
+        for file_path in list_supported_files(folder_path)
+    }
+    new_files = [path for path in current if path not in manifest]
+    changed_files = [path for path in current if path in manifest and manifest[path]["file_hash"] != current[path]["file_hash"]]
+    skipped_files = [path for path in current if path in manifest and manifest[path]["file_hash"] == current[path]["file_hash"]]
+    removed_files = [path for path in manifest if path not in current]
+
+    # A duplicate whose canonical file is going away or changing gets a fresh look
+    moving = set(removed_files) | set(changed_files)
+    for path in list(skipped_files):
+        if manifest[path].get("duplicate_of") in moving:
+            skipped_files.remove(path)
+            changed_files.append(path)
+    logger.info("New: %d, changed: %d, unchanged: %d, removed: %d", len(new_files), len(changed_files), len(skipped_files), len(removed_files))
+
+    # Step 1b : Exact duplicates (same content hash as an indexed or earlier file) are not even parsed
+    duplicates = {}
+    canonical_by_hash = {
+        entry["file_hash"]: path for path, entry in manifest.items()
+        if path in skipped_files and not entry.get("duplicate_of")
+    }
+    to_load = []
+    for path in new_files + changed_files:
+        canonical = canonical_by_hash.setdefault(current[path]["file_hash"], path)
+        if canonical != path:
+            duplicates[path] = {"duplicate_of": canonical, "kind": "exact", "similarity": 1.0}
+        else:
+            to_load.append(path)
+
+    # Step 2 : Load and process only new / changed documents
+    cache_stats = {}
+    raw_documents , failed = load_and_process_documents(
+        folder_path, files=to_load, progress=progress, fingerprints=current, cache_stats=cache_stats
+    )
+
+    # Step 2b : Near-duplicates, by MinHash signature of the whole text
+    docs_by_file = {}
+    for doc in raw_documents:
+        docs_by_file.setdefault(doc.metadata["source_file"], []).append(doc)
+    lsh = MinHashLSH()
+    for path, entry in manifest.items():
+        if path in skipped_files and entry.get("minhash") and not entry.get("duplicate_of"):
+            lsh.add(path, entry["minhash"])
+    signatures = {}
+    raw_documents = []
+    for path, docs in docs_by_file.items():
+        signature = minhash_signature("\n".join(doc.page_content for doc in docs))
+        match = lsh.query(signature) if signature else None
+        if match:
+            duplicates[path] = {"duplicate_of": match[0], "kind": "near", "similarity": round(match[1], 3)}
+            continue
+        if signature:
+            lsh.add(path, signature)
+            signatures[path] = signature
+        raw_documents.extend(docs)
+    if duplicates:
+        logger.info("Collapsed %d duplicate file(s): %s", len(duplicates), ", ".join(Path(p).name for p in duplicates))
+
+    #Step 3 : Split documents into chunks
+    if progress:
+        progress("chunk", len(to_load), len(to_load), failed)
     chunks = chunk_documents(raw_documents)
 
-    #Step 3 : Generate embeddings
-    vector_store = generate_embeddings(chunks)
+    # A changed file that failed to load keeps its old vectors and manifest
+    # entry, so it is retried on the next run
+    loaded_files = {doc.metadata["source_file"] for doc in raw_documents}
+    stale_files = removed_files + [p for p in changed_files if p in loaded_files or p in duplicates]
+    stale_ids = []
+    for path in stale_files:
+        stale_ids.extend(manifest.pop(path)["chunk_ids"])
 
-    #Step 4 : Save vector store
-    vector_store.save_local(output_path)
-    print(f"Vector store saved at {output_path}")
+    # vector ids that leave / join the flat index, applied to the ANN index at the end
+    new_store = vector_store is None
+    removed_ids = [np.zeros(0, dtype=np.int64)]
+    if vector_store is not None and stale_files:
+        removed_ids.append(vector_store.delete_files(stale_files))
+
+    #Step 4 : Generate embeddings (added to the existing store if there is one)
+    if vector_store is None and not chunks:
+        logger.info("No documents to embed.")
+    elif chunks or stale_ids:
+        # the index is rewritten anyway, so drop vectors tombstoned by delete_file
+        if vector_store is not None:
+            removed_ids.append(vector_store.compact())
+        if progress:
+            progress("embed", len(to_load), len(to_load), failed)
+        vector_store = generate_embeddings(chunks, store_path, vector_store=vector_store, embeddings=embeddings)
+
+        #Step 5 : Save vector store, then the manifest that describes it
+        if progress:
+            progress("save", len(to_load), len(to_load), failed)
+        with stage_timer("index_save"):
+            vector_store.save()
+        logger.info("Vector store saved at %s", store_path)
+
+    # Record the fingerprint of every file we now hold vectors for, so the
+    # next run can skip it (and not even re-hash it if size/mtime still match)
+    for path in skipped_files:
+        manifest[path].update(current[path])
+    for path in loaded_files:
+        manifest[path] = dict(current[path], file_name=Path(path).name, chunk_ids=[], minhash=signatures.get(path))
+    for path, duplicate in duplicates.items():
+        manifest[path] = dict(
+            current[path], file_name=Path(path).name, chunk_ids=[],
+            duplicate_of=duplicate["duplicate_of"], duplicate_kind=duplicate["kind"],
+        )
+    for chunk in chunks:
+        manifest[chunk.metadata["source_file"]]["chunk_ids"].append(chunk.metadata["chunk_id"])
+    if vector_store is not None and (chunks or stale_ids or not os.path.exists(os.path.join(store_path, FILE_SUMMARY_FILE))):
+        save_file_summaries(store_path, vector_store, manifest, refresh=loaded_files)
+    # The ANN index (if INDEX_TYPE is not flat) follows the flat store's changes
+    # incrementally; it is retrained only for a new store, a new INDEX_TYPE or
+    # once the store's size drifted far from the size it was trained at
+    if vector_store is not None and (chunks or stale_ids or not ann_index_is_current(store_path)):
+        if progress:
+            progress("index", len(to_load), len(to_load), failed)
+        added_ids = np.concatenate([np.zeros(0, dtype=np.int64), *vector_store.ids_for_files(loaded_files).values()])
+        with stage_timer("index_build"):
+            update_ann_index(store_path, vector_store.index, added_ids, np.concatenate(removed_ids), rebuild=new_store)
+    save_manifest(store_path, manifest)
+    if vector_store is not None:
+        vector_store.close()
 
     return {
         "total_documents": len(raw_documents),
         "total_chunks": len(chunks),
+        "added": len([p for p in new_files if p in loaded_files]),
+        "updated": len([p for p in changed_files if p in loaded_files]),
+        "skipped": len(skipped_files),
+        "removed": len(removed_files),
+        "duplicates": [
+            {"file_name": Path(path).name, "duplicate_of": Path(d["duplicate_of"]).name, "kind": d["kind"], "similarity": d["similarity"]}
+            for path, d in duplicates.items()
+        ],
+        "duplicate_groups": duplicate_groups(manifest),
         "failed_files": failed,
-        "vector_db_path": output_path
+        "extract_cache": cache_stats,
+        "index": load_ann_meta(store_path) or {"index_type": "flat"},
+    }
+
+
+# === Single-file delete / replace ===
+def compact_tombstones(vector_store):
+    """ Purge tombstoned vectors once they pass TOMBSTONE_COMPACT_FRACTION of the index.
+
+    Searches over-fetch by the tombstone count, so without this every API
+    delete would make queries slower until the next ingest with changes.
+    Rewriting the index is O(store), but happens only once every so many
+    deleted chunks. Returns the purged ids (for update_ann_index).
+    """
+    if vector_store.tombstone_count() <= TOMBSTONE_COMPACT_FRACTION * max(vector_store.ntotal, 1):
+        return np.zeros(0, dtype=np.int64)
+    return vector_store.compact()
+
+def delete_file(file_path, output_path):
+    """ Remove one file's chunks from the vector store without a rebuild.
+
+    Only the chunk store's delta database is written (rows removed, vector
+    ids tombstoned); the index files and the base database are shared with
+    the previous generation, until the tombstones are compacted (see
+    compact_tombstones). Returns the number of chunks removed.
+    """
+    file_path = str(file_path)
+    with new_generation(output_path) as generation:
+        vector_store = ChunkStore.open(generation.path, read_only=False)
+        if vector_store is None:
+            generation.publish = False
+            return 0
+        try:
+            removed = vector_store.tombstone_files([file_path])
+            purged = compact_tombstones(vector_store)
+            vector_store.save()
+            if len(purged):
+                update_ann_index(generation.path, vector_store.index, removed_ids=purged)
+
+            manifest = load_manifest(generation.path)
+            manifest.pop(file_path, None)
+            # duplicates collapsed onto this file are ingested in their own right next run
+            for path in [p for p, entry in manifest.items() if entry.get("duplicate_of") == file_path]:
+                manifest.pop(path)
+            save_file_summaries(generation.path, vector_store, manifest, refresh=set())
+            save_manifest(generation.path, manifest)
+        finally:
+            vector_store.close()
+    logger.info("Removed %d chunks of %s", removed, file_path)
+    return removed
+
+def find_duplicate(file_path, fingerprint, signature, manifest):
+    """ The indexed file that file_path duplicates, as {duplicate_of, kind, similarity}, or None.
+
+    Exact duplicates share the content hash, near ones are found by MinHash/LSH
+    over the extracted text (signature, None if not parsed yet). Only
+    canonical files (indexed in their own right) are candidates.
+    """
+    candidates = {
+        path: entry for path, entry in manifest.items()
+        if path != file_path and not entry.get("duplicate_of") and entry.get("chunk_ids")
+    }
+    for path, entry in candidates.items():
+        if entry["file_hash"] == fingerprint["file_hash"]:
+            return {"duplicate_of": path, "kind": "exact", "similarity": 1.0}
+    if not signature:
+        return None
+    lsh = MinHashLSH()
+    for path, entry in candidates.items():
+        if entry.get("minhash"):
+            lsh.add(path, entry["minhash"])
+    match = lsh.query(signature)
+    if match:
+        return {"duplicate_of": match[0], "kind": "near", "similarity": round(match[1], 3)}
+    return None
+
+def replace_file(file_path, output_path, fingerprint=None):
+    """ (Re-)ingest one file: tombstone its old chunks and embed the new ones.
+
+    fingerprint, if given (e.g. from the upload), saves hashing the file again.
+
+    Parsing, chunking and embedding cover only this file. As in embed_folder
+    a duplicate of an indexed file (same hash, or near-identical text) is not
+    embedded but recorded with duplicate_of; files that were collapsed onto
+    the old version are dropped from the manifest, so the next embed_folder
+    run examines them again. Returns a summary like embed_folder's, or raises
+    ValueError if the file cannot be loaded.
+    """
+    file_path = Path(file_path)
+    fingerprint = fingerprint_file(file_path, known=fingerprint)
+
+    def parse():
+        raw_documents, failed = load_and_process_documents(
+            file_path.parent, files=[file_path], fingerprints={str(file_path): fingerprint}
+        )
+        if failed:
+            raise ValueError(f"Could not load {file_path.name}")
+        return raw_documents, minhash_signature("\n".join(doc.page_content for doc in raw_documents))
+
+    # an exact duplicate is not even parsed (checked again under the writer lock below)
+    parsed = None
+    if find_duplicate(str(file_path), fingerprint, None, load_manifest(current_store_path(output_path))) is None:
+        parsed = parse()
+
+    with new_generation(output_path) as generation:
+        store_path = generation.path
+        vector_store = ChunkStore.open(store_path, read_only=False)
+        existed = vector_store is not None
+        try:
+            manifest = load_manifest(store_path) if existed else {}
+            duplicate = find_duplicate(str(file_path), fingerprint, parsed[1] if parsed else None, manifest)
+            if duplicate is None and parsed is None:
+                parsed = parse()  # its twin went away meanwhile
+                duplicate = find_duplicate(str(file_path), fingerprint, parsed[1], manifest)
+            removed = vector_store.tombstone_files([str(file_path)]) if existed else 0
+            purged = compact_tombstones(vector_store) if existed else np.zeros(0, dtype=np.int64)
+            # duplicates collapsed onto the old version get a fresh look next run
+            for path in [p for p, entry in manifest.items() if entry.get("duplicate_of") == str(file_path)]:
+                manifest.pop(path)
+
+            if duplicate is not None:
+                chunks = []
+                manifest[str(file_path)] = dict(
+                    fingerprint, file_name=file_path.name, chunk_ids=[],
+                    duplicate_of=duplicate["duplicate_of"], duplicate_kind=duplicate["kind"],
+                )
+                vector_store.save()
+                if len(purged):
+                    update_ann_index(store_path, vector_store.index, removed_ids=purged)
+            else:
+                raw_documents, signature = parsed
+                chunks = chunk_documents(raw_documents)
+                vector_store = generate_embeddings(chunks, store_path, vector_store=vector_store)
+                vector_store.save()
+
+                new_ids = vector_store.ids_for_files([str(file_path)]).get(str(file_path), [])
+                update_ann_index(store_path, vector_store.index, added_ids=new_ids, removed_ids=purged, rebuild=not existed)
+                manifest[str(file_path)] = dict(
+                    fingerprint, file_name=file_path.name, chunk_ids=[chunk.metadata["chunk_id"] for chunk in chunks],
+                    minhash=signature,
+                )
+            save_file_summaries(store_path, vector_store, manifest, refresh={str(file_path)})
+            save_manifest(store_path, manifest)
+        finally:
+            if vector_store is not None:
+                vector_store.close()
+
+    if duplicate is not None:
+        logger.info("Replaced %s: %d old chunks, duplicate of %s", file_path.name, removed, Path(duplicate["duplicate_of"]).name)
+    else:
+        logger.info("Replaced %s: %d old chunks, %d new chunks", file_path.name, removed, len(chunks))
+    return {
+        "file_name": file_path.name,
+        "removed_chunks": removed,
+        "total_chunks": len(chunks),
+        "duplicate_of": Path(duplicate["duplicate_of"]).name if duplicate else None,
+        "vector_db_path": output_path,
+        "generation": generation.name
     }
 
 
 # Run the embedding process
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    os.makedirs(INPUT_FOLDER, exist_ok=True)  # Ensure the input directory exists
     result = embed_folder(INPUT_FOLDER, VECTOR_DB_PATH)
-    print("\nEmbedding Summary")
-    print(f"- Processed documents: {result['total_documents']}")
-    print(f"- Created chunks: {result['total_chunks']}")
-    print(f"- Failed files: {len(result['failed_files'])}")
-    print(f"- Vector DB location: {result['vector_db_path']}")
+    logger.info("Embedding Summary")
+    logger.info("- Processed documents: %d", result["total_documents"])
+    logger.info("- Created chunks: %d", result["total_chunks"])
+    logger.info("- Added / updated / skipped files: %d / %d / %d", result["added"], result["updated"], result["skipped"])
+    logger.info("- Failed files: %d", len(result["failed_files"]))
+    logger.info("- Vector DB location: %s", result["vector_db_path"])
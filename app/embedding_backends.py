@@ -0,0 +1,124 @@
+import os
+import logging
+from pathlib import Path
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+# === CONFIGURATIONS ===
+EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+# torch     : sentence-transformers on torch (full precision)
+# onnx      : the same model exported to ONNX, run with onnxruntime (no torch needed)
+# onnx-int8 : the ONNX model with int8 dynamic quantization of its weights
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch").lower()
+EMBEDDING_BACKENDS = ("torch", "onnx", "onnx-int8")
+ONNX_MODEL_DIR = os.getenv("ONNX_MODEL_DIR", "onnx_models")  # exported / quantized models are kept here
+ONNX_MAX_LENGTH = 256  # all-MiniLM-L6-v2's max_seq_length
+ONNX_BATCH_SIZE = 32
+ONNX_THREADS = int(os.getenv("ONNX_THREADS", "0"))  # 0 = let onnxruntime decide
+
+logger = logging.getLogger(__name__)
+
+
+# === ONNX Runtime backend ===
+class OnnxEmbeddings(Embeddings):
+    """Sentence embeddings from an ONNX export of a sentence-transformers model.
+
+    Reproduces the sentence-transformers pipeline (tokenize, transformer,
+    mean pooling over the attention mask, L2 normalization) with only
+    tokenizers + onnxruntime, so torch is not needed at runtime.
+    """
+
+    def __init__(self, model_path, tokenizer_path):
+        import onnxruntime
+        from tokenizers import Tokenizer
+
+        self.tokenizer = Tokenizer.from_file(str(tokenizer_path))
+        self.tokenizer.enable_truncation(max_length=ONNX_MAX_LENGTH)
+        self.tokenizer.enable_padding()
+
+        options = onnxruntime.SessionOptions()
+        if ONNX_THREADS:
+            options.intra_op_num_threads = ONNX_THREADS
+        self.session = onnxruntime.InferenceSession(str(model_path), options, providers=["CPUExecutionProvider"])
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+
+    def _encode(self, texts):
+        encodings = self.tokenizer.encode_batch(texts)
+        input_ids = np.asarray([e.ids for e in encodings], dtype=np.int64)
+        attention_mask = np.asarray([e.attention_mask for e in encodings], dtype=np.int64)
+        feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self.input_names:
+            feeds["token_type_ids"] = np.asarray([e.type_ids for e in encodings], dtype=np.int64)
+
+        token_embeddings = self.session.run(None, feeds)[0]
+        mask = attention_mask[..., None].astype(np.float32)
+        pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        return pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+
+    def embed_documents(self, texts):
+        vectors = [self._encode(texts[i:i + ONNX_BATCH_SIZE]) for i in range(0, len(texts), ONNX_BATCH_SIZE)]
+        return np.vstack(vectors).tolist() if vectors else []
+
+    def embed_query(self, text):
+        return self._encode([text])[0].tolist()
+
+
+def _model_dir(model_name):
+    return Path(ONNX_MODEL_DIR) / model_name.replace("/", "__")
+
+
+def ensure_onnx_model(model_name=EMBEDDING_MODEL, quantize=False):
+    """Return (model_path, tokenizer_path), fetching/quantizing the ONNX model on first use.
+
+    The fp32 export published with the model on the Hugging Face hub is used
+    as-is; the int8 variant is produced locally with onnxruntime's dynamic
+    quantization.
+    """
+    model_dir = _model_dir(model_name)
+    model_path = model_dir / "model.onnx"
+    tokenizer_path = model_dir / "tokenizer.json"
+    if not model_path.exists() or not tokenizer_path.exists():
+        from huggingface_hub import hf_hub_download
+
+        model_dir.mkdir(parents=True, exist_ok=True)
+        logger.info("Fetching ONNX export of %s", model_name)
+        for remote, local in (("onnx/model.onnx", model_path), ("tokenizer.json", tokenizer_path)):
+            downloaded = hf_hub_download(model_name, remote)
+            tmp_path = local.with_name(local.name + ".tmp")
+            tmp_path.write_bytes(Path(downloaded).read_bytes())
+            os.replace(tmp_path, local)
+
+    if not quantize:
+        return model_path, tokenizer_path
+
+    quantized_path = model_dir / "model_int8.onnx"
+    if not quantized_path.exists():
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        logger.info("Quantizing %s to int8", model_path)
+        tmp_path = quantized_path.with_name("model_int8.tmp.onnx")
+        quantize_dynamic(str(model_path), str(tmp_path), weight_type=QuantType.QInt8)
+        os.replace(tmp_path, quantized_path)
+    return quantized_path, tokenizer_path
+
+
+# === Backend selection ===
+def get_embedding_model(backend=None, model_name=EMBEDDING_MODEL):
+    """Build the embedding model for the configured backend (used for both ingest and query)."""
+    backend = (backend or EMBEDDING_BACKEND).lower()
+    if backend not in EMBEDDING_BACKENDS:
+        raise ValueError(f"Unknown EMBEDDING_BACKEND {backend!r}, expected one of {', '.join(EMBEDDING_BACKENDS)}")
+
+    if backend == "torch":
+        # imported here so the ONNX backends never load torch
+        from langchain_community.embeddings import HuggingFaceEmbeddings
+
+        return HuggingFaceEmbeddings(
+            model_name=model_name,
+            model_kwargs={"device": "cpu"},
+            encode_kwargs={"normalize_embeddings": True},
+        )
+
+    model_path, tokenizer_path = ensure_onnx_model(model_name, quantize=backend == "onnx-int8")
+    return OnnxEmbeddings(model_path, tokenizer_path)
@@ -0,0 +1,138 @@
+import os
+import time
+import queue
+import threading
+from concurrent.futures import Future
+
+from app.metrics import EMBED_BATCH_FILL, EMBED_QUEUE_WAIT_SECONDS
+
+# === CONFIGURATIONS ===
+BATCH_MAX_SIZE = int(os.getenv("EMBED_BATCH_MAX_SIZE", "32"))  # flush when this many queries are waiting
+BATCH_MAX_WAIT_MS = float(os.getenv("EMBED_BATCH_MAX_WAIT_MS", "5"))  # ... or this long after the first one arrived
+EMBED_TIMEOUT_SECONDS = float(os.getenv("EMBED_TIMEOUT_SECONDS", "30"))  # a caller gives up after this long
+
+
+# === Micro-batching query embedder ===
+# Concurrent compare requests each need one query embedding. Instead of each
+# request thread running batch-size-1 inference, requests queue their text and
+# a single worker thread encodes whatever is waiting as one batch, then hands
+# every caller its own vector back. Every future of a batch gets either its
+# vector or the batch's exception, whatever goes wrong in the worker, and
+# callers stop waiting after EMBED_TIMEOUT_SECONDS.
+class EmbeddingBatcher:
+    def __init__(self, embed_documents, max_batch_size=BATCH_MAX_SIZE, max_wait_ms=BATCH_MAX_WAIT_MS,
+                 timeout_seconds=EMBED_TIMEOUT_SECONDS):
+        self.embed_documents = embed_documents
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000
+        self.timeout = timeout_seconds
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker = None
+        self._stats = {
+            "requests": 0,
+            "batches": 0,
+            "batch_size_max": 0,
+            "queue_wait_ms_total": 0.0,
+            "queue_wait_ms_max": 0.0,
+            "encode_ms_total": 0.0,
+            "failed_batches": 0,
+            "timeouts": 0,
+        }
+
+    def embed(self, text):
+        """Embed one text, batched with whatever other callers are waiting.
+
+        Blocks until done; raises TimeoutError after timeout_seconds, or the
+        exception that failed the batch.
+        """
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((text, time.perf_counter(), future))
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            future.cancel()  # dropped by the worker if it has not picked it up yet
+            with self._lock:
+                self._stats["timeouts"] += 1
+            raise TimeoutError(f"Query embedding did not finish within {self.timeout:g}s") from None
+
+    def _ensure_worker(self):
+        if self._worker is None:
+            with self._lock:
+                if self._worker is None:
+                    self._worker = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+                    self._worker.start()
+
+    def _collect(self):
+        """Block for the first request, then gather more until the batch is full or the window closes."""
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            # callers that timed out while queued cancelled their future: leave them out
+            batch = [item for item in self._collect() if item[2].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            try:
+                self._embed_batch(batch)
+            except BaseException as e:
+                with self._lock:
+                    self._stats["failed_batches"] += 1
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def _embed_batch(self, batch):
+        started = time.perf_counter()
+        vectors = self.embed_documents([text for text, _, _ in batch])
+        finished = time.perf_counter()
+        if len(vectors) != len(batch):
+            raise RuntimeError(f"Embedding returned {len(vectors)} vectors for {len(batch)} texts")
+
+        waits = [started - queued_at for _, queued_at, _ in batch]
+        with self._lock:
+            self._stats["requests"] += len(batch)
+            self._stats["batches"] += 1
+            self._stats["batch_size_max"] = max(self._stats["batch_size_max"], len(batch))
+            self._stats["queue_wait_ms_total"] += sum(waits) * 1000
+            self._stats["queue_wait_ms_max"] = max(self._stats["queue_wait_ms_max"], max(waits) * 1000)
+            self._stats["encode_ms_total"] += (finished - started) * 1000
+        EMBED_BATCH_FILL.observe(len(batch) / self.max_batch_size)
+        for wait in waits:
+            EMBED_QUEUE_WAIT_SECONDS.observe(wait)
+
+        for (_, _, future), vector in zip(batch, vectors):
+            future.set_result(vector)
+
+    def stats(self):
+        """Batch fill rate and queue wait so far."""
+        with self._lock:
+            s = dict(self._stats)
+        batches = s["batches"] or 1
+        requests = s["requests"] or 1
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "requests": s["requests"],
+            "batches": s["batches"],
+            "avg_batch_size": s["requests"] / batches,
+            "batch_fill_rate": s["requests"] / (batches * self.max_batch_size),
+            "batch_size_max": s["batch_size_max"],
+            "queue_wait_ms_avg": s["queue_wait_ms_total"] / requests,
+            "queue_wait_ms_max": s["queue_wait_ms_max"],
+            "encode_ms_avg": s["encode_ms_total"] / batches,
+            "failed_batches": s["failed_batches"],
+            "timeouts": s["timeouts"],
+            "queued": self._queue.qsize(),
+        }
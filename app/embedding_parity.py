@@ -0,0 +1,79 @@
+import sys
+import json
+import argparse
+
+import numpy as np
+
+from app.embedding_backends import get_embedding_model, EMBEDDING_BACKENDS
+from app.chunk_store import ChunkStore
+from app.generations import current_store_path
+
+# === CONFIGURATIONS ===
+VECTOR_DB_PATH = "cv_vectorstore"  # chunk texts are taken from this store
+INPUT_FOLDER = "cv_documents"  # ... or parsed from here if there is no store yet
+SAMPLE_SIZE = 500  # corpus texts to embed with both backends
+NUM_QUERIES = 50  # corpus texts reused as queries for the top-K overlap
+TOP_K = 20
+
+
+def load_corpus(limit=SAMPLE_SIZE):
+    """Chunk texts from the local store, or freshly chunked CVs if there is none."""
+    store = ChunkStore.open(current_store_path(VECTOR_DB_PATH))
+    if store is not None:
+        try:
+            # the chunks view: base rows minus deleted ones, plus the delta's
+            rows = store.conn.execute("SELECT page_content FROM chunks ORDER BY id LIMIT ?", (limit,)).fetchall()
+        finally:
+            store.close()
+        return [row[0] for row in rows]
+
+    from app.embed_files import load_and_process_documents, chunk_documents
+
+    documents, _ = load_and_process_documents(INPUT_FOLDER)
+    return [chunk.page_content for chunk in chunk_documents(documents)[:limit]]
+
+
+def parity_report(texts, candidate="onnx-int8", baseline="torch", num_queries=NUM_QUERIES, k=TOP_K):
+    """Cosine drift and top-K overlap of a backend against the baseline on the same texts."""
+    base = np.asarray(get_embedding_model(baseline).embed_documents(texts), dtype=np.float32)
+    cand = np.asarray(get_embedding_model(candidate).embed_documents(texts), dtype=np.float32)
+
+    # both are L2-normalized, so the row-wise dot product is the cosine
+    cosine = (base * cand).sum(axis=1)
+    drift = 1.0 - cosine
+
+    # rank the corpus for the first num_queries texts with each backend
+    k = min(k, len(texts))
+    queries = min(num_queries, len(texts))
+    base_top = np.argsort(-(base[:queries] @ base.T), axis=1)[:, :k]
+    cand_top = np.argsort(-(cand[:queries] @ cand.T), axis=1)[:, :k]
+    overlap = [len(set(b) & set(c)) / k for b, c in zip(base_top, cand_top)]
+
+    return {
+        "baseline": baseline,
+        "candidate": candidate,
+        "texts": len(texts),
+        "cosine_drift_mean": float(drift.mean()),
+        "cosine_drift_p99": float(np.percentile(drift, 99)),
+        "cosine_drift_max": float(drift.max()),
+        "queries": queries,
+        "k": k,
+        "topk_overlap_mean": float(np.mean(overlap)),
+        "topk_overlap_min": float(np.min(overlap)),
+    }
+
+
+# Run the parity check
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare an embedding backend against the torch baseline.")
+    parser.add_argument("--backend", default="onnx-int8", choices=EMBEDDING_BACKENDS)
+    parser.add_argument("--baseline", default="torch", choices=EMBEDDING_BACKENDS)
+    parser.add_argument("--sample", type=int, default=SAMPLE_SIZE)
+    parser.add_argument("--k", type=int, default=TOP_K)
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.sample)
+    if not corpus:
+        print("[ERROR] No local corpus found. Run embed_files first or add CVs to cv_documents.")
+        sys.exit(1)
+    print(json.dumps(parity_report(corpus, candidate=args.backend, baseline=args.baseline, k=args.k), indent=2))
@@ -0,0 +1,91 @@
+import os
+import gzip
+import json
+import logging
+from pathlib import Path
+
+from langchain.schema import Document
+
+# === CONFIGURATIONS ===
+EXTRACT_CACHE_DIR = os.getenv("EXTRACT_CACHE_DIR", "extract_cache")  # folder for cached page text
+EXTRACT_CACHE_MAX_MB = int(os.getenv("EXTRACT_CACHE_MAX_MB", "1024"))  # evict oldest entries above this
+CACHE_FORMAT_VERSION = 1  # bump to invalidate every entry (e.g. when loaders change)
+
+logger = logging.getLogger(__name__)
+
+# Keys that describe where a file lives rather than what it contains. They are
+# not cached, the caller re-attaches them for the current path.
+FILE_METADATA_KEYS = ("source", "source_file", "file_name", "file_size", "file_hash")
+
+
+# === Extracted-text cache ===
+# One gzipped JSON file per (content hash, loader) holding the page text and
+# loader metadata of a parsed file, so re-chunking or changing the embedding
+# model never has to run PDF/DOCX extraction again for unchanged files.
+def _entry_path(file_hash, loader_name):
+    return Path(EXTRACT_CACHE_DIR) / f"{file_hash}-{loader_name}-v{CACHE_FORMAT_VERSION}.json.gz"
+
+
+def get(file_hash, loader_name):
+    """Return the cached pages as Documents (without file metadata), or None on a miss."""
+    path = _entry_path(file_hash, loader_name)
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            pages = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.warning("Ignoring unreadable cache entry %s: %s", path.name, e)
+        return None
+
+    os.utime(path)  # mark as recently used for eviction
+    return [Document(page_content=page["page_content"], metadata=page["metadata"]) for page in pages]
+
+
+def put(file_hash, loader_name, documents):
+    """Store the pages of a parsed file. Written to a temp file and renamed, so readers never see half an entry."""
+    path = _entry_path(file_hash, loader_name)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    pages = [
+        {
+            "page_content": doc.page_content,
+            "metadata": {k: v for k, v in doc.metadata.items() if k not in FILE_METADATA_KEYS},
+        }
+        for doc in documents
+    ]
+    tmp_path = path.with_name(path.name + f".{os.getpid()}.tmp")
+    try:
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            json.dump(pages, f)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        # a cache write failing must never fail the ingest
+        logger.warning("Could not write cache entry %s: %s", path.name, e)
+        tmp_path.unlink(missing_ok=True)
+
+
+def evict(max_bytes=None):
+    """Delete least recently used entries until the cache fits in max_bytes. Returns the number removed."""
+    if max_bytes is None:
+        max_bytes = EXTRACT_CACHE_MAX_MB * 1024 * 1024
+    cache_dir = Path(EXTRACT_CACHE_DIR)
+    if not cache_dir.exists():
+        return 0
+
+    entries = []
+    for path in cache_dir.glob("*.json.gz"):
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+
+    total = sum(size for _, size, _ in entries)
+    removed = 0
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        path.unlink(missing_ok=True)
+        total -= size
+        removed += 1
+    return removed
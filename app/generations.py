@@ -0,0 +1,221 @@
+import os
+import json
+import time
+import fcntl
+import shutil
+import socket
+import logging
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+from app.ann_index import ANN_INDEX_FILE, ANN_META_FILE
+from app.chunk_store import INDEX_FILE, CHUNK_DB_FILE, CHUNK_DELTA_FILE, store_exists, copy_database
+
+# === CONFIGURATIONS ===
+GENERATIONS_DIR = "generations"  # <store>/generations/000001, 000002, ...
+CURRENT_FILE = "CURRENT"  # <store>/CURRENT holds the name of the generation readers should open
+GENERATION_MANIFEST = "generation.json"  # written last: a generation without it was never published
+READERS_DIR = "readers"  # <generation>/readers/<host>-<pid>: pins refreshed by the processes reading it
+WRITER_LOCK_FILE = ".writer.lock"
+GENERATION_GRACE_SECONDS = int(os.getenv("GENERATION_GRACE_SECONDS", "600"))  # keep superseded generations this long
+KEEP_GENERATIONS = int(os.getenv("KEEP_GENERATIONS", "2"))  # never collect the newest N, whatever their age
+PIN_REFRESH_SECONDS = 60
+
+logger = logging.getLogger(__name__)
+
+# Files of a store generation. All but the chunk store's delta database are
+# only ever replaced (temp file + rename), never written in place, so a new
+# generation can hard-link them from its parent; the delta is copied (it only
+# holds what changed since the base chunks.sqlite was written, see chunk_store).
+STORE_FILES = (INDEX_FILE, CHUNK_DB_FILE, "file_summaries.npz", ANN_INDEX_FILE, ANN_META_FILE, "ingest_manifest.json")
+
+
+# === Index generations ===
+# Every write (ingest, single-file delete or replace) builds a new numbered
+# generation next to the published ones, starting from a copy of the current
+# one, and publishes it by atomically replacing CURRENT. Readers resolve
+# CURRENT once, keep using the generation they opened and so never see a
+# half-written store. Superseded generations are removed after a grace period,
+# unless a process still pins them. Stores written before generations existed
+# (files directly in the store folder) are read as they are and become the
+# base of the first generation.
+def _generations_root(root):
+    return os.path.join(root, GENERATIONS_DIR)
+
+
+def _list_generations(root):
+    path = _generations_root(root)
+    if not os.path.isdir(path):
+        return []
+    return sorted(name for name in os.listdir(path) if name.isdigit())
+
+
+def current_generation(root):
+    """Name of the published generation, or None if there is none (yet)."""
+    try:
+        with open(os.path.join(root, CURRENT_FILE), "r", encoding="utf-8") as f:
+            name = f.read().strip()
+    except FileNotFoundError:
+        return None
+    return name or None
+
+
+def current_store_path(root):
+    """Folder readers should open: the current generation, or root for a pre-generation store."""
+    name = current_generation(root)
+    if name is not None:
+        return os.path.join(_generations_root(root), name)
+    return root
+
+
+def load_generation_manifest(store_path):
+    path = os.path.join(store_path, GENERATION_MANIFEST)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+class Generation:
+    """A generation being written. Set publish = False to throw it away instead."""
+
+    def __init__(self, root, name, parent):
+        self.root = root
+        self.name = name
+        self.parent = parent
+        self.path = os.path.join(_generations_root(root), name)
+        self.publish = True
+
+
+def _copy_store(source, target):
+    for name in STORE_FILES:
+        src = os.path.join(source, name)
+        if not os.path.exists(src):
+            continue
+        try:
+            os.link(src, os.path.join(target, name))
+        except OSError:
+            shutil.copy2(src, os.path.join(target, name))
+    src_delta = os.path.join(source, CHUNK_DELTA_FILE)
+    if os.path.exists(src_delta):
+        copy_database(src_delta, os.path.join(target, CHUNK_DELTA_FILE))
+
+
+@contextmanager
+def new_generation(root):
+    """Write a new generation of the store at root and publish it on success.
+
+    Yields a Generation whose path starts as a copy of the current store.
+    Writers are serialized with a lock file, across processes too. If the
+    block raises (or sets publish = False) the generation is deleted and
+    readers never see it.
+    """
+    os.makedirs(_generations_root(root), exist_ok=True)
+    with open(os.path.join(root, WRITER_LOCK_FILE), "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            parent = current_generation(root)
+            existing = _list_generations(root)
+            name = f"{int(existing[-1]) + 1 if existing else 1:06d}"
+            generation = Generation(root, name, parent)
+            os.makedirs(generation.path)
+            try:
+                base = current_store_path(root)
+                if store_exists(base):
+                    _copy_store(base, generation.path)
+                yield generation
+                if generation.publish:
+                    _publish(generation)
+            except BaseException:
+                shutil.rmtree(generation.path, ignore_errors=True)
+                raise
+            if not generation.publish:
+                shutil.rmtree(generation.path, ignore_errors=True)
+            else:
+                collect_garbage(root)
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _publish(generation):
+    with open(os.path.join(generation.path, GENERATION_MANIFEST), "w", encoding="utf-8") as f:
+        json.dump({
+            "generation": generation.name,
+            "parent": generation.parent,
+            "published_at": datetime.now(timezone.utc).isoformat(),
+            "files": sorted(name for name in os.listdir(generation.path) if name != GENERATION_MANIFEST),
+        }, f, indent=2)
+    current_path = os.path.join(generation.root, CURRENT_FILE)
+    with open(current_path + ".tmp", "w", encoding="utf-8") as f:
+        f.write(generation.name)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(current_path + ".tmp", current_path)
+    logger.info("Published store generation %s", generation.name)
+
+
+# === Reader pins ===
+_pinned = {}  # store path -> time of the last refresh by this process
+
+
+def pin(store_path):
+    """Mark store_path as in use by this process (refreshed at most every PIN_REFRESH_SECONDS)."""
+    if os.path.basename(os.path.dirname(store_path)) != GENERATIONS_DIR:
+        return  # a pre-generation store is never collected
+    now = time.monotonic()
+    if now - _pinned.get(store_path, -PIN_REFRESH_SECONDS) < PIN_REFRESH_SECONDS:
+        return
+    readers = os.path.join(store_path, READERS_DIR)
+    try:
+        if not os.path.isdir(readers):
+            os.mkdir(readers)  # not makedirs: that would bring a collected generation back
+        with open(os.path.join(readers, f"{socket.gethostname()}-{os.getpid()}"), "w"):
+            pass
+    except FileNotFoundError:
+        return  # collected already; the caller moves on to the current generation
+    _pinned[store_path] = now
+
+
+def _pinned_by_someone(store_path, now):
+    readers = os.path.join(store_path, READERS_DIR)
+    if not os.path.isdir(readers):
+        return False
+    return any(now - os.path.getmtime(os.path.join(readers, name)) < GENERATION_GRACE_SECONDS for name in os.listdir(readers))
+
+
+# === Garbage collection ===
+def collect_garbage(root, now=None):
+    """Delete superseded generations older than the grace period. Returns their names.
+
+    A generation is kept while it is among the newest KEEP_GENERATIONS, for
+    GENERATION_GRACE_SECONDS after the next one was published, and while a
+    reader pinned it within that period. Unpublished leftovers of failed
+    writers older than the current generation are deleted too.
+    """
+    now = time.time() if now is None else now
+    current = current_generation(root)
+    if current is None:
+        return []
+    names = _list_generations(root)
+    keep = set(names[-KEEP_GENERATIONS:]) | {current}
+    removed = []
+    superseded_at = None  # publish time of the next newer generation
+    for name in reversed(names):
+        path = os.path.join(_generations_root(root), name)
+        manifest = load_generation_manifest(path)
+        published = os.path.getmtime(os.path.join(path, GENERATION_MANIFEST)) if manifest else None
+        if name not in keep and name < current:
+            expired = superseded_at is not None and now - superseded_at > GENERATION_GRACE_SECONDS
+            if manifest is None or (expired and not _pinned_by_someone(path, now)):
+                shutil.rmtree(path, ignore_errors=True)
+                removed.append(name)
+        if published is not None:
+            superseded_at = published
+    # the pre-generation files in root were superseded when the oldest generation still around was published
+    if superseded_at is not None and now - superseded_at > GENERATION_GRACE_SECONDS:
+        for name in (*STORE_FILES, CHUNK_DELTA_FILE, "index.pkl"):
+            if os.path.exists(os.path.join(root, name)):
+                os.remove(os.path.join(root, name))
+    if removed:
+        logger.info("Removed store generation(s) %s", ", ".join(removed))
+    return removed
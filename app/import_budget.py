@@ -0,0 +1,90 @@
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import subprocess
+from pathlib import Path
+
+# === CONFIGURATIONS ===
+MODULE = "main"  # what uvicorn imports before it can serve anything
+IMPORT_BUDGET_SECONDS = float(os.getenv("IMPORT_BUDGET_SECONDS", "2.0"))  # wall time of `import main`, best run
+RUNS = 3
+# Must not be imported by MODULE: they belong to the deferred ML stack (see app.ml_stack)
+HEAVY_MODULES = (
+    "torch", "transformers", "sentence_transformers", "onnxruntime", "optimum", "faiss",
+    "langchain", "langchain_community", "langchain_core", "langchain_huggingface",
+    "unstructured", "pypdf", "docx2txt",
+)
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+_PROBE = "import json, sys, {module}; print(json.dumps(sorted(sys.modules)))"
+_IMPORTTIME = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)$")
+
+
+# === Import-time budget ===
+# Guards the API's cold start: imports MODULE in a fresh interpreter, as
+# uvicorn does, and fails if that takes longer than the budget or loads any
+# of HEAVY_MODULES. Run it in CI / before a release:
+#   python -m app.import_budget [--budget 2.0]
+def measure(module=MODULE):
+    """(seconds, loaded module names, -X importtime lines) of one cold import of module."""
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _PROBE.format(module=module)],
+        cwd=REPO_ROOT, capture_output=True, text=True,
+    )
+    seconds = time.perf_counter() - started
+    importtime_lines = [line for line in result.stderr.splitlines() if line.startswith("import time:")]
+    if result.returncode != 0:
+        errors = [line for line in result.stderr.splitlines() if not line.startswith("import time:")]
+        raise RuntimeError(f"import {module} failed:\n" + "\n".join(errors[-20:]))
+    return seconds, json.loads(result.stdout.strip().splitlines()[-1]), importtime_lines
+
+
+def slowest_imports(importtime_lines, top=10):
+    """Top-level packages by cumulative import time, as [(name, seconds)]."""
+    totals = {}
+    for line in importtime_lines:
+        match = _IMPORTTIME.match(line)
+        if match and len(match.group(3)) == 1:  # one space of indent: imported directly, not by another package
+            name = match.group(4).split(".")[0]
+            totals[name] = totals.get(name, 0) + int(match.group(2)) / 1e6
+    return sorted(totals.items(), key=lambda item: -item[1])[:top]
+
+
+def check(module=MODULE, budget=IMPORT_BUDGET_SECONDS, runs=RUNS):
+    """Import module `runs` times cold; returns the report, with "ok" False on any violation."""
+    best, loaded, lines = None, None, None
+    for _ in range(runs):
+        seconds, modules, importtime_lines = measure(module)
+        if best is None or seconds < best:
+            best, loaded, lines = seconds, modules, importtime_lines
+    heavy = sorted({name.split(".")[0] for name in loaded} & set(HEAVY_MODULES))
+    return {
+        "module": module,
+        "seconds": round(best, 3),
+        "budget_seconds": budget,
+        "heavy_modules": heavy,
+        "slowest": [(name, round(seconds, 3)) for name, seconds in slowest_imports(lines)],
+        "ok": best <= budget and not heavy,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fail if importing the API is slow or loads the ML stack.")
+    parser.add_argument("--module", default=MODULE)
+    parser.add_argument("--budget", type=float, default=IMPORT_BUDGET_SECONDS, help="seconds")
+    parser.add_argument("--runs", type=int, default=RUNS)
+    args = parser.parse_args()
+
+    report = check(args.module, args.budget, args.runs)
+    print(f"import {report['module']}: {report['seconds']:.3f}s (budget {report['budget_seconds']:.3f}s)")
+    for name, seconds in report["slowest"]:
+        print(f"  {name:<30} {seconds:.3f}s")
+    if report["heavy_modules"]:
+        print(f"Loads the ML stack at import time: {', '.join(report['heavy_modules'])}")
+    if report["seconds"] > report["budget_seconds"]:
+        print("Over the import-time budget.")
+    sys.exit(0 if report["ok"] else 1)
@@ -0,0 +1,129 @@
+import logging
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from app.metrics import FAILURES
+
+# === CONFIGURATIONS ===
+INGEST_WORKERS = 1  # runs are serialized on the index anyway, see _index_lock
+MAX_TRACKED_JOBS = 200  # finished jobs kept for status polling
+
+logger = logging.getLogger(__name__)
+
+# === Background ingestion jobs ===
+# Uploads return a job id straight away and embed_folder runs on the pool.
+# Because embed_folder always scans the whole folder, an upload that arrives
+# while a run is still queued is merged into that run (same job id) instead of
+# starting another one. Runs never overlap on the index: each one holds
+# _index_lock for its whole duration.
+_executor = ThreadPoolExecutor(max_workers=INGEST_WORKERS, thread_name_prefix="ingest")
+_jobs_lock = threading.Lock()
+_index_lock = threading.Lock()
+_jobs = OrderedDict()
+_queued_job_id = None
+
+
+def _now():
+    return datetime.utcnow().isoformat()
+
+
+def _update(job_id, **fields):
+    with _jobs_lock:
+        _jobs[job_id].update(fields)
+
+
+def _run(job_id, folder_path, output_path):
+    global _queued_job_id
+    with _index_lock:
+        # from here on, new uploads must start a new run
+        with _jobs_lock:
+            if _queued_job_id == job_id:
+                _queued_job_id = None
+            _jobs[job_id].update(status="running", started_at=_now())
+            fingerprints = _jobs[job_id].pop("_fingerprints")
+
+        def progress(stage, done, total, failed_files):
+            _update(job_id, stage=stage, files_done=done, files_total=total, failed_files=list(failed_files))
+
+        try:
+            from app.embed_files import embed_folder  # the ML stack, loaded on first use (see app.ml_stack)
+
+            summary = embed_folder(folder_path, output_path, progress=progress, fingerprints=fingerprints)
+        except Exception as e:
+            logger.exception("Ingest job %s failed", job_id)
+            FAILURES.labels(kind="ingest_job").inc()
+            _update(job_id, status="failed", error=str(e), finished_at=_now())
+            return
+        _update(
+            job_id,
+            status="completed",
+            stage="done",
+            failed_files=summary["failed_files"],
+            summary=summary,
+            finished_at=_now(),
+        )
+
+
+def submit_ingest(folder_path, output_path, saved_files, fingerprints=None):
+    """Queue an ingest run (or join the queued one). Returns (job_id, merged).
+
+    fingerprints ({path: fingerprint}) computed while the files were uploaded
+    are handed to embed_folder so it does not hash them again.
+    """
+    global _queued_job_id
+    with _jobs_lock:
+        if _queued_job_id is not None:
+            _jobs[_queued_job_id]["saved_files"].extend(saved_files)
+            _jobs[_queued_job_id]["_fingerprints"].update(fingerprints or {})
+            return _queued_job_id, True
+
+        job_id = uuid.uuid4().hex
+        _jobs[job_id] = {
+            "job_id": job_id,
+            "status": "queued",
+            "stage": None,
+            "files_done": 0,
+            "files_total": None,
+            "failed_files": [],
+            "saved_files": list(saved_files),
+            "summary": None,
+            "error": None,
+            "created_at": _now(),
+            "started_at": None,
+            "finished_at": None,
+            "_fingerprints": dict(fingerprints or {}),
+        }
+        _queued_job_id = job_id
+
+        # forget the oldest finished jobs
+        while len(_jobs) > MAX_TRACKED_JOBS:
+            oldest = next(iter(_jobs))
+            if _jobs[oldest]["status"] not in ("completed", "failed"):
+                break
+            _jobs.popitem(last=False)
+
+    _executor.submit(_run, job_id, folder_path, output_path)
+    return job_id, False
+
+
+def run_exclusive(func, *args, timeout=60):
+    """Run func(*args) while no ingest run is touching the index.
+
+    Raises TimeoutError if the index stays busy for `timeout` seconds.
+    """
+    if not _index_lock.acquire(timeout=timeout):
+        raise TimeoutError("The index is busy with an ingest run, try again shortly.")
+    try:
+        return func(*args)
+    finally:
+        _index_lock.release()
+
+
+def get_job(job_id):
+    """Return a snapshot of the job status, or None if unknown."""
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+        return {k: v for k, v in job.items() if not k.startswith("_")} if job else None
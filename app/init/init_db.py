@@ -1,8 +1,21 @@
+from sqlalchemy import inspect
+
 from app.database.database import engine , Base
 from app.models.user_model import User # import user model
 
 
+def create_missing_indexes():
+    """ create_all() only creates indexes together with new tables; add the ones existing tables lack """
+    inspector = inspect(engine)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
+
 if __name__ == "__main__":
     print("📦 Creating database tables...")
     Base.metadata.create_all(bind=engine)
-    print("✅ Database tables created successfully!")
\ No newline at end of file
+    create_missing_indexes()
+    print("✅ Database tables created successfully!")
@@ -0,0 +1,76 @@
+import re
+import math
+import unicodedata
+from collections import Counter
+
+# === CONFIGURATIONS ===
+BM25_K1 = 1.2  # term frequency saturation
+BM25_B = 0.75  # chunk length normalization
+
+# Words (e.g. "node.js", "c++", "c#", "asp.net") are lower-cased and never
+# stemmed, so keyword filters match skills exactly as written
+_TOKEN = re.compile(r"[a-z0-9][a-z0-9+#]*(?:\.[a-z0-9+#]+)*")
+
+# Left out of job description queries for lexical scoring only; chunks are
+# indexed with every word, so filters on e.g. "go" or "it" still work
+STOPWORDS = frozenset("""
+a about above after all also am an and any are as at be been being both but by can could did do does doing
+during each etc few for from further had has have having he her here hers him his how i if in into is it its
+itself just may me might more most must my no nor not of off on once only or other our ours out over own per
+same shall she should so some such than that the their theirs them then there these they this those through
+to too under until up very via was we were what when where which while who whom why will with within would
+you your yours able ability across candidate candidates experience good great ideal including join looking
+new plus preferred required requirements responsibilities role skills strong team work working years
+""".split())
+
+
+# === Inverted index over chunks ===
+# ChunkStore keeps the index in its SQLite database, next to the chunk rows:
+# postings (term, chunk id, term frequency), the length of every chunk and
+# the document frequency of every term, updated as chunks are added and
+# deleted. This module holds the text side: tokenization and BM25.
+def tokenize(text):
+    """Lower-cased words of text, in order."""
+    return _TOKEN.findall(unicodedata.normalize("NFKC", text).lower())
+
+
+def term_counts(text):
+    """{term: frequency} and the length (in words) of text."""
+    tokens = tokenize(text)
+    return Counter(tokens), len(tokens)
+
+
+def query_terms(text):
+    """Distinct words of a job description worth scoring, stopwords left out."""
+    return list(dict.fromkeys(token for token in tokenize(text) if token not in STOPWORDS and len(token) > 1))
+
+
+def parse_phrase(term):
+    """Words of a keyword filter term ("Django", "machine learning"); raises ValueError if there are none."""
+    tokens = tokenize(term)
+    if not tokens:
+        raise ValueError(f"Keyword {term!r} has no searchable words")
+    return tokens
+
+
+def contains_phrase(tokens, phrase):
+    """Whether phrase (a list of words) occurs in tokens as consecutive words."""
+    if len(phrase) == 1:
+        return phrase[0] in tokens
+    n = len(phrase)
+    return any(tokens[i:i + n] == phrase for i in range(len(tokens) - n + 1) if tokens[i] == phrase[0])
+
+
+def idf(df, n_chunks):
+    return math.log(1 + (n_chunks - df + 0.5) / (df + 0.5))
+
+
+def bm25(term_freqs, length, idfs, avg_length):
+    """BM25 score of one chunk ({term: frequency}, length) for query terms with the given idfs."""
+    norm = BM25_K1 * (1 - BM25_B + BM25_B * length / (avg_length or 1))
+    score = 0.0
+    for term, weight in idfs.items():
+        tf = term_freqs.get(term)
+        if tf:
+            score += weight * tf * (BM25_K1 + 1) / (tf + norm)
+    return score
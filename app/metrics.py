@@ -0,0 +1,68 @@
+import os
+import resource
+import platform
+
+from prometheus_client import (
+    CollectorRegistry, Counter, Gauge, Histogram, CONTENT_TYPE_LATEST, REGISTRY, generate_latest, multiprocess,
+)
+
+# === CONFIGURATIONS ===
+METRICS_PREFIX = "hr_assistant"
+# Set PROMETHEUS_MULTIPROC_DIR when running several uvicorn workers so that
+# /metrics aggregates all of them instead of reporting whichever one answered.
+MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
+# Ingest stages run for seconds to minutes, query stages for milliseconds
+STAGE_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+# === Metrics ===
+# Stages: load, chunk, embed, index_save, index_build (ingest);
+# vector_store_load, query_embed, faiss_search, grouping, lexical_fusion (query).
+STAGE_SECONDS = Histogram(
+    f"{METRICS_PREFIX}_stage_seconds", "Time spent in each pipeline stage", ["stage"], buckets=STAGE_BUCKETS
+)
+DOCUMENTS = Counter(f"{METRICS_PREFIX}_documents_loaded", "Documents (pages) loaded from CV files")
+CHUNKS = Counter(f"{METRICS_PREFIX}_chunks_created", "Chunks produced by the text splitter")
+FAILURES = Counter(f"{METRICS_PREFIX}_failures", "Failed files and jobs", ["kind"])  # kind: load, ingest_job
+CACHE_REQUESTS = Counter(f"{METRICS_PREFIX}_query_cache_requests", "Query cache lookups", ["layer", "result"])  # result: hit, miss
+INDEX_VECTORS = Gauge(f"{METRICS_PREFIX}_index_vectors", "Vectors in the loaded FAISS index", multiprocess_mode="max")
+INDEX_FILES = Gauge(f"{METRICS_PREFIX}_index_files", "CV files in the loaded vector store", multiprocess_mode="max")
+INDEX_BYTES = Gauge(f"{METRICS_PREFIX}_index_bytes", "On-disk size of the vector store", multiprocess_mode="max")
+EMBED_BATCH_FILL = Histogram(
+    f"{METRICS_PREFIX}_embedding_batch_fill_ratio", "Query embedding batch size / max batch size",
+    buckets=(0.05, 0.1, 0.25, 0.5, 0.75, 1.0),
+)
+EMBED_QUEUE_WAIT_SECONDS = Histogram(
+    f"{METRICS_PREFIX}_embedding_queue_wait_seconds", "Time a query waited for its embedding batch to start",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+PEAK_RSS_BYTES = Gauge(f"{METRICS_PREFIX}_peak_rss_bytes", "Peak resident memory of the process", multiprocess_mode="livesum")
+
+
+def stage_timer(stage):
+    """Context manager / decorator that records the wrapped block under stage."""
+    return STAGE_SECONDS.labels(stage=stage).time()
+
+
+def set_index_size(ntotal, files, path):
+    """Update the index gauges after a store was loaded or written."""
+    INDEX_VECTORS.set(ntotal)
+    INDEX_FILES.set(files)
+    size = 0
+    for name in os.listdir(path):
+        full = os.path.join(path, name)
+        if os.path.isfile(full):
+            size += os.path.getsize(full)
+    INDEX_BYTES.set(size)
+
+
+def render():
+    """Body and content type for the /metrics endpoint."""
+    # ru_maxrss is in kilobytes on Linux, bytes on macOS
+    PEAK_RSS_BYTES.set(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if platform.system() == "Darwin" else 1024))
+    if MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
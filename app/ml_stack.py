@@ -0,0 +1,74 @@
+import os
+import time
+import logging
+import importlib
+import threading
+from datetime import datetime, timezone
+
+# === CONFIGURATIONS ===
+# background: load the ML stack in a thread at startup; ready once it is loaded
+# lazy      : load it with the first request that needs it; ready at once
+ML_WARM_UP = os.getenv("ML_WARM_UP", "background").lower()
+# the modules that pull in langchain, transformers / torch (or onnxruntime), faiss and the document loaders
+ML_MODULES = ("app.compare_cvs", "app.embed_files")
+
+logger = logging.getLogger(__name__)
+
+# === Deferred ML stack ===
+# main.py imports nothing that loads the ML stack, so login, users, match
+# history and /metrics serve as soon as uvicorn is up. Endpoints that need
+# the stack import ML_MODULES inside the handler; the warm-up thread imports
+# them ahead of the first such request and loads the embedding model and
+# the vector store. Readiness follows the warm-up, liveness only fails if
+# the warm-up did (a restart is the way out of that).
+_lock = threading.Lock()
+_state = {"status": "cold", "error": None, "started_at": None, "ready_at": None, "seconds": None}
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _warm_up():
+    started = time.monotonic()
+    try:
+        for name in ML_MODULES:
+            importlib.import_module(name)
+        from app.compare_cvs import warm_up
+
+        warm_up()
+    except Exception as e:
+        logger.exception("ML stack warm-up failed")
+        with _lock:
+            _state.update(status="failed", error=repr(e))
+        return
+    seconds = round(time.monotonic() - started, 2)
+    with _lock:
+        _state.update(status="ready", ready_at=_now(), seconds=seconds)
+    logger.info("ML stack loaded in %.2fs", seconds)
+
+
+def start_warm_up():
+    """Start loading the ML stack in a background thread (once per process, see ML_WARM_UP)."""
+    with _lock:
+        if _state["status"] != "cold":
+            return
+        if ML_WARM_UP == "lazy":
+            _state["status"] = "lazy"
+            return
+        _state.update(status="loading", started_at=_now())
+    threading.Thread(target=_warm_up, name="ml-warm-up", daemon=True).start()
+
+
+def status():
+    """{status, error, started_at, ready_at, seconds}; status is cold, loading, ready, lazy or failed."""
+    with _lock:
+        return dict(_state)
+
+
+def is_ready():
+    return status()["status"] in ("ready", "lazy")
+
+
+def is_alive():
+    return status()["status"] != "failed"
@@ -1,9 +1,9 @@
-from sqlalchemy import Column, Integer, String, Text, Float, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, String, Text, Float, ForeignKey, DateTime, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.database.database import Base
-from pydantic import BaseModel, EmailStr
-from typing import List, Optional
+from pydantic import BaseModel, EmailStr, Field
+from typing import Dict, List, Optional
 
 # =============================
 # ✅ SQLAlchemy MODELS
@@ -25,6 +25,8 @@ class User(Base):
 
 class MatchHistory(Base):
     __tablename__ = "match_history"
+    # a user's history is listed newest first, paged by (created_at, id)
+    __table_args__ = (Index("ix_match_history_user_id_created_at", "user_id", "created_at", "id"),)
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"))
     job_description = Column(Text, nullable=False)
@@ -38,7 +40,7 @@ class MatchHistory(Base):
 class MatchResult(Base):
     __tablename__ = "match_results"
     id = Column(Integer, primary_key=True, index=True)
-    history_id = Column(Integer, ForeignKey("match_history.id", ondelete="CASCADE"))
+    history_id = Column(Integer, ForeignKey("match_history.id", ondelete="CASCADE"), index=True)
     file_name = Column(String(255), nullable=False)
     score = Column(Float, nullable=False)
     matched_content = Column(Text)
@@ -81,3 +83,20 @@ class MatchHistorySchema(BaseModel):
 
     class Config:
         orm_mode = True
+
+class MatchHistoryPage(BaseModel):
+    items: List[MatchHistorySchema]
+    next_cursor: Optional[str] = None  # pass back as ?cursor= for the next (older) page, None on the last page
+
+# ------------------------------
+# Compare schemas
+# ------------------------------
+
+class CompareBatchRequest(BaseModel):
+    job_descriptions: List[str]
+    n_results: Optional[int] = Field(None, ge=1)  # return this many distinct CVs per job description
+    sections: Optional[List[str]] = None  # only match these CV sections, e.g. ["skills", "experience"]
+    section_weights: Optional[Dict[str, float]] = None  # e.g. {"skills": 2.0}: favour hits in these sections
+    must_have: Optional[List[str]] = None  # only CVs mentioning every one of these keywords / phrases
+    exclude: Optional[List[str]] = None  # drop CVs mentioning any of these
+    lexical_weight: float = Field(0.0, ge=0, le=1)  # share of the BM25 keyword score in the ranking
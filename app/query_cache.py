@@ -0,0 +1,237 @@
+import os
+import re
+import json
+import time
+import hashlib
+import logging
+import threading
+import unicodedata
+from collections import OrderedDict
+
+import numpy as np
+from langchain_core.documents import Document
+
+from app.metrics import CACHE_REQUESTS
+
+# === CONFIGURATIONS ===
+QUERY_CACHE_BACKEND = os.getenv("QUERY_CACHE_BACKEND", "memory")  # memory (per process) | redis (shared) | off
+QUERY_CACHE_URL = os.getenv("QUERY_CACHE_URL", "redis://localhost:6379/0")  # redis backend only
+QUERY_CACHE_TTL_SECONDS = int(os.getenv("QUERY_CACHE_TTL_SECONDS", "3600"))
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "4096"))
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "1024"))
+QUERY_CACHE_MAX_MB = int(os.getenv("QUERY_CACHE_MAX_MB", "64"))  # per layer, memory backend
+
+logger = logging.getLogger(__name__)
+
+
+# === Query cache ===
+# Two layers in front of compare_with_job_description: query embeddings keyed
+# by (model, normalized job description), and final grouped results keyed by
+# (job description, search parameters, store version). The store version
+# changes with every published generation, so results of an older store are
+# never served; they just age out. Values are kept encoded (bytes), which
+# makes the memory figures exact and lets the redis backend share them
+# between workers.
+def normalize_text(text):
+    """Job description text as used for keys (and embedded): NFC, whitespace collapsed."""
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFC", text)).strip()
+
+
+def make_key(*parts):
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class MemoryCache:
+    """Thread-safe LRU with a TTL and entry / byte bounds, values are bytes."""
+
+    def __init__(self, name, max_entries, ttl_seconds=QUERY_CACHE_TTL_SECONDS, max_bytes=QUERY_CACHE_MAX_MB * 2**20):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl = ttl_seconds
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "expired": 0}
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] < time.monotonic():
+                self._drop(key)
+                self._stats["expired"] += 1
+                entry = None
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return entry[1]
+
+    def set(self, key, value):
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._bytes += len(value)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self._stats["evictions"] += 1
+
+    def _drop(self, key):
+        _, value = self._entries.pop(key)
+        self._bytes -= len(value)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return dict(
+                self._stats, backend="memory", entries=len(self._entries), bytes=self._bytes,
+                hit_rate=round(self._stats["hits"] / lookups, 4) if lookups else 0.0,
+            )
+
+
+class RedisCache:
+    """The same interface over a shared redis; eviction is redis' own (set maxmemory-policy allkeys-lru).
+
+    The cache is an optimization only: if redis fails, a get is a miss and a
+    set does nothing. Errors are counted, and logged once per outage.
+    """
+
+    def __init__(self, name, url=QUERY_CACHE_URL, ttl_seconds=QUERY_CACHE_TTL_SECONDS):
+        import redis  # optional dependency, only needed for this backend
+
+        self.name = name
+        self.ttl = ttl_seconds
+        self.prefix = f"hr_assistant:{name}:"
+        self._client = redis.Redis.from_url(url)
+        self._redis_error = redis.RedisError
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "errors": 0}
+        self._failing = False
+
+    def _failed(self, e):
+        with self._lock:
+            self._stats["errors"] += 1
+            first = not self._failing
+            self._failing = True
+        if first:
+            logger.warning("Query cache %s: redis unavailable, serving without it (%s)", self.name, e)
+
+    def _recovered(self):
+        if self._failing:
+            with self._lock:
+                self._failing = False
+            logger.info("Query cache %s: redis is back", self.name)
+
+    def get(self, key):
+        try:
+            value = self._client.get(self.prefix + key)
+        except self._redis_error as e:
+            self._failed(e)
+            value = None
+        else:
+            self._recovered()
+        with self._lock:
+            self._stats["hits" if value is not None else "misses"] += 1
+        return value
+
+    def set(self, key, value):
+        try:
+            self._client.set(self.prefix + key, value, ex=self.ttl)
+        except self._redis_error as e:
+            self._failed(e)
+        else:
+            self._recovered()
+
+    def clear(self):
+        pass  # keys carry the store version; stale ones expire on their own
+
+    def stats(self):
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return dict(
+                self._stats, backend="redis", hit_rate=round(self._stats["hits"] / lookups, 4) if lookups else 0.0,
+            )
+
+
+def _make_cache(backend, name, max_entries):
+    if backend == "off":
+        return None
+    if backend == "redis":
+        return RedisCache(name)
+    return MemoryCache(name, max_entries)
+
+
+def set_backend(backend):
+    """(Re)create both layers with the given backend (memory, redis or off)."""
+    global _backend, _embedding_cache, _result_cache
+    _backend = backend
+    _embedding_cache = _make_cache(backend, "embeddings", EMBEDDING_CACHE_MAX_ENTRIES)
+    _result_cache = _make_cache(backend, "results", RESULT_CACHE_MAX_ENTRIES)
+
+
+_backend = _embedding_cache = _result_cache = None
+set_backend(QUERY_CACHE_BACKEND)
+
+
+def _lookup(cache, key):
+    value = cache.get(key)
+    CACHE_REQUESTS.labels(layer=cache.name, result="hit" if value is not None else "miss").inc()
+    return value
+
+
+# === Embedding layer ===
+def get_embedding(model, text):
+    """Cached query vector for (model, normalized text), or None."""
+    if _embedding_cache is None:
+        return None
+    value = _lookup(_embedding_cache, make_key(model, text))
+    return None if value is None else np.frombuffer(value, dtype=np.float32)
+
+
+def put_embedding(model, text, vector):
+    if _embedding_cache is not None:
+        _embedding_cache.set(make_key(model, text), np.asarray(vector, dtype=np.float32).tobytes())
+
+
+# === Result layer ===
+def get_results(key):
+    """Cached {file_name: (Document, score)} for a results key, or None."""
+    if _result_cache is None:
+        return None
+    value = _lookup(_result_cache, key)
+    if value is None:
+        return None
+    return {
+        file_name: (Document(page_content=page_content, metadata=metadata), score)
+        for file_name, page_content, metadata, score in json.loads(value)
+    }
+
+
+def put_results(key, best_by_file):
+    if _result_cache is not None:
+        _result_cache.set(key, json.dumps([
+            [file_name, doc.page_content, doc.metadata, float(score)] for file_name, (doc, score) in best_by_file.items()
+        ]).encode())
+
+
+def clear_results():
+    """Drop cached results (they belong to a store version that is no longer current)."""
+    if _result_cache is not None:
+        _result_cache.clear()
+
+
+def stats():
+    return {
+        "backend": _backend,
+        "embeddings": _embedding_cache.stats() if _embedding_cache is not None else None,
+        "results": _result_cache.stats() if _result_cache is not None else None,
+    }
@@ -1,8 +1,11 @@
 from fpdf import FPDF
 import os
+import random
+import argparse
+import zipfile
+from xml.sax.saxutils import escape
 
 output_dir = "cv_documents"
-os.makedirs(output_dir, exist_ok=True)
 
 cv_samples = [
     {
@@ -47,6 +50,104 @@ University of Data"""
     # Add more CVs here...
 ]
 
+# === Synthetic corpus ===
+# Parametric CVs for benchmarking (see app/benchmark.py): a role gives the
+# skill pool and wording, the length the number of jobs and bullets. Every
+# bullet mixes random verbs, skills, projects and figures, so generated CVs
+# are similar in topic but not near-duplicates of each other.
+ROLES = {
+    "Software Engineer": {
+        "skills": ["Python", "Django", "FastAPI", "Go", "Java", "Kubernetes", "Docker", "AWS", "PostgreSQL", "Redis", "Kafka", "gRPC", "Terraform", "React", "TypeScript"],
+        "degrees": ["BSc Computer Science", "MSc Software Engineering", "BEng Computer Engineering"],
+        "objects": ["REST APIs", "payment services", "a microservice platform", "CI/CD pipelines", "an internal SDK", "the search backend", "a billing system"],
+    },
+    "Data Analyst": {
+        "skills": ["SQL", "Python", "Tableau", "Power BI", "Excel", "pandas", "dbt", "Looker", "R", "A/B testing", "statistics", "Snowflake"],
+        "degrees": ["BSc Statistics", "BSc Economics", "MSc Business Analytics"],
+        "objects": ["executive dashboards", "churn reports", "a KPI framework", "marketing attribution models", "weekly revenue forecasts", "a self-service reporting layer"],
+    },
+    "Data Scientist": {
+        "skills": ["Python", "scikit-learn", "PyTorch", "TensorFlow", "XGBoost", "Spark", "SQL", "NLP", "computer vision", "MLflow", "feature engineering", "Bayesian modeling"],
+        "degrees": ["MSc Data Science", "PhD Machine Learning", "MSc Applied Mathematics"],
+        "objects": ["recommendation models", "a fraud detection model", "demand forecasting", "a document classifier", "an experimentation platform", "customer segmentation"],
+    },
+    "DevOps Engineer": {
+        "skills": ["Linux", "Kubernetes", "Terraform", "Ansible", "AWS", "GCP", "Prometheus", "Grafana", "Jenkins", "GitHub Actions", "Bash", "Helm"],
+        "degrees": ["BSc Information Technology", "BSc Computer Science", "BEng Network Engineering"],
+        "objects": ["the deployment pipeline", "cluster autoscaling", "on-call runbooks", "infrastructure as code", "the monitoring stack", "disaster recovery"],
+    },
+    "Product Manager": {
+        "skills": ["roadmapping", "user research", "Jira", "SQL", "stakeholder management", "A/B testing", "OKRs", "agile", "pricing", "go-to-market"],
+        "degrees": ["MBA", "BSc Business Administration", "BA Economics"],
+        "objects": ["the onboarding flow", "a mobile checkout", "the pricing page", "a B2B analytics product", "the partner program", "quarterly roadmaps"],
+    },
+    "HR Specialist": {
+        "skills": ["recruiting", "onboarding", "HRIS", "Workday", "employee relations", "compensation", "labor law", "payroll", "talent development", "interviewing"],
+        "degrees": ["BA Human Resources", "BA Psychology", "MSc Organizational Behavior"],
+        "objects": ["the hiring process", "a mentoring program", "performance reviews", "the benefits package", "employer branding", "exit interviews"],
+    },
+}
+LENGTHS = {"short": (1, 2), "medium": (3, 3), "long": (6, 5)}  # (jobs, bullets per job)
+FORMATS = ("pdf", "docx", "txt")
+
+FIRST_NAMES = ["John", "Jane", "Alex", "Maria", "Wei", "Fatima", "Lucas", "Aisha", "Sven", "Priya", "Kenji", "Olga", "Diego", "Amara", "Noah", "Lea"]
+LAST_NAMES = ["Doe", "Smith", "Garcia", "Chen", "Khan", "Muller", "Rossi", "Okafor", "Tanaka", "Novak", "Silva", "Patel", "Johansson", "Dubois"]
+COMPANIES = ["TechCorp", "Insight Analytics", "Northwind", "Globex", "Initech", "Umbrella Labs", "Stark Systems", "Acme Cloud", "Blue Harbor", "Helios Data"]
+VERBS = ["Developed", "Designed", "Led", "Built", "Improved", "Automated", "Migrated", "Maintained", "Scaled", "Launched", "Refactored", "Owned"]
+OUTCOMES = ["cutting costs by {n}%", "for {n}k users", "reducing latency by {n}%", "across {n} teams", "saving {n} hours a week", "raising conversion by {n}%"]
+UNIVERSITIES = ["University of Technology", "University of Data", "State University", "Institute of Science", "City College", "National University"]
+
+
+def make_cv(rng, role, length="medium"):
+    """Text of one synthetic CV for the given role and length."""
+    spec = ROLES[role]
+    jobs, bullets = LENGTHS[length]
+    first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+    years = rng.randint(jobs, jobs * 3 + 2)
+    skills = rng.sample(spec["skills"], k=min(len(spec["skills"]), 4 + jobs))
+
+    lines = [
+        f"{first} {last}",
+        f"Email: {first.lower()}.{last.lower()}{rng.randint(1, 9999)}@example.com",
+        f"Phone: +1 555 {rng.randint(100, 999)} {rng.randint(1000, 9999)}",
+        "",
+        "SUMMARY",
+        f"{role} with {years} years of experience. Skilled in {', '.join(skills[:3])} and {skills[3]}.",
+        "",
+        "EXPERIENCE",
+    ]
+    year = 2025
+    for _ in range(jobs):
+        start = year - rng.randint(1, 4)
+        lines.append(f"{role} - {rng.choice(COMPANIES)}")
+        lines.append(f"{start} - {year}")
+        for _ in range(bullets):
+            outcome = rng.choice(OUTCOMES).format(n=rng.randint(5, 90))
+            lines.append(f"- {rng.choice(VERBS)} {rng.choice(spec['objects'])} using {rng.choice(skills)}, {outcome}.")
+        lines.append("")
+        year = start
+    lines += [
+        "EDUCATION",
+        rng.choice(spec["degrees"]),
+        rng.choice(UNIVERSITIES),
+        "",
+        "SKILLS",
+        ", ".join(skills),
+    ]
+    return "\n".join(lines)
+
+
+def make_job_description(rng, role):
+    """A job description for the given role, for query benchmarks."""
+    spec = ROLES[role]
+    skills = rng.sample(spec["skills"], k=min(len(spec["skills"]), 5))
+    return (
+        f"We are hiring a {role} to work on {rng.choice(spec['objects'])}. "
+        f"You have {rng.randint(2, 8)}+ years of experience with {', '.join(skills[:-1])} and {skills[-1]}. "
+        f"A degree such as {rng.choice(spec['degrees'])} is a plus."
+    )
+
+
 def sanitize_text(text: str) -> str:
     # Replace problematic characters with ASCII equivalents
     return (text.replace("–", "-")
@@ -64,14 +165,81 @@ def create_pdf(file_path: str, text: str):
         pdf.multi_cell(0, 10, line)
     pdf.output(file_path)
 
-# Generate PDFs
-pdf_files = []
-for cv in cv_samples:
-    filename = f"{cv['name'].replace(' ', '_')}.pdf"
-    file_path = os.path.join(output_dir, filename)
-    create_pdf(file_path, cv["content"])
-    pdf_files.append(file_path)
-
-print("✅ PDFs created:")
-for f in pdf_files:
-    print(f)
+def create_docx(file_path: str, text: str):
+    # A minimal WordprocessingML package (one paragraph per line), enough for docx2txt
+    paragraphs = "".join(
+        f'<w:p><w:r><w:t xml:space="preserve">{escape(line)}</w:t></w:r></w:p>' for line in text.split("\n")
+    )
+    with zipfile.ZipFile(file_path, "w", zipfile.ZIP_DEFLATED) as docx:
+        docx.writestr("[Content_Types].xml", (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/word/document.xml" ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+            '</Types>'
+        ))
+        docx.writestr("_rels/.rels", (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="word/document.xml"/>'
+            '</Relationships>'
+        ))
+        docx.writestr("word/document.xml", (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+            f'<w:body>{paragraphs}</w:body></w:document>'
+        ))
+
+def create_txt(file_path: str, text: str):
+    with open(file_path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+WRITERS = {"pdf": create_pdf, "docx": create_docx, "txt": create_txt}
+
+
+def generate_corpus(folder, count, formats=FORMATS, roles=None, lengths=None, seed=0):
+    """Write count synthetic CVs to folder, cycling through formats. Returns their paths.
+
+    Roles and lengths are drawn at random (from all of them unless given);
+    the same seed always produces the same corpus.
+    """
+    rng = random.Random(seed)
+    roles = list(roles or ROLES)
+    lengths = list(lengths or LENGTHS)
+    os.makedirs(folder, exist_ok=True)
+    paths = []
+    for i in range(count):
+        role = rng.choice(roles)
+        fmt = formats[i % len(formats)]
+        file_path = os.path.join(folder, f"cv_{i:06d}_{role.replace(' ', '_')}.{fmt}")
+        WRITERS[fmt](file_path, make_cv(rng, role, rng.choice(lengths)))
+        paths.append(file_path)
+    return paths
+
+
+# Generate the sample CVs, or a synthetic corpus with --count
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create sample CVs.")
+    parser.add_argument("--count", type=int, default=0, help="generate this many synthetic CVs instead of the samples")
+    parser.add_argument("--formats", default=",".join(FORMATS), help="comma-separated: pdf,docx,txt")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output-dir", default=output_dir)
+    args = parser.parse_args()
+
+    if args.count:
+        pdf_files = generate_corpus(args.output_dir, args.count, formats=args.formats.split(","), seed=args.seed)
+        print(f"✅ {len(pdf_files)} CVs created in {args.output_dir}")
+    else:
+        # Generate PDFs
+        os.makedirs(args.output_dir, exist_ok=True)
+        pdf_files = []
+        for cv in cv_samples:
+            filename = f"{cv['name'].replace(' ', '_')}.pdf"
+            file_path = os.path.join(args.output_dir, filename)
+            create_pdf(file_path, cv["content"])
+            pdf_files.append(file_path)
+
+        print("✅ PDFs created:")
+        for f in pdf_files:
+            print(f)
@@ -1,6 +1,8 @@
 import streamlit as st
 import os
 
+from app.uploads import stream_file_to_temp, commit_upload, discard_uploads, UploadTooLarge, MAX_UPLOAD_FILE_MB, MAX_UPLOAD_REQUEST_MB
+
 # folder to store uploaded cvs
 UPLOAD_FOLDER = "cv_documents"
 
@@ -20,15 +22,25 @@ if uploaded_files:
     st.write(f"**{len(uploaded_files)} files selected**")
 
     with st.spinner("Saving files..."):
-        for uploaded_file in uploaded_files:
-            #Build the full path to save the file
-            save_path = os.path.join(UPLOAD_FOLDER, uploaded_file.name)
-
-            # Save file to folder
-            with open(save_path, "wb") as f:
-                f.write(uploaded_file.getbuffer())
-
-    st.success("✅ All files uploaded successfully!")
+        # Stream each file to a temp file in chunks (no full in-memory copy), then move them into place
+        staged = []
+        request_budget = [MAX_UPLOAD_REQUEST_MB * 1024 * 1024]
+        try:
+            for uploaded_file in uploaded_files:
+                #Build the full path to save the file
+                save_path = os.path.join(UPLOAD_FOLDER, os.path.basename(uploaded_file.name))
+                staged.append((save_path, stream_file_to_temp(uploaded_file, save_path, MAX_UPLOAD_FILE_MB * 1024 * 1024, request_budget)))
+        except UploadTooLarge as e:
+            discard_uploads([upload for _, upload in staged])
+            staged = None
+            st.error(f"❌ {e}")
+
+        if staged is not None:
+            for save_path, upload in staged:
+                commit_upload(upload, save_path)
+
+    if staged is not None:
+        st.success("✅ All files uploaded successfully!")
 
     # process 
 
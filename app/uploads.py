@@ -0,0 +1,144 @@
+import os
+import hashlib
+import uuid
+from pathlib import Path
+
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+
+# === CONFIGURATIONS ===
+UPLOAD_CHUNK_SIZE = 1024 * 1024  # copy uploads 1 MB at a time
+MAX_UPLOAD_FILE_MB = int(os.getenv("MAX_UPLOAD_FILE_MB", "50"))  # per file
+MAX_UPLOAD_REQUEST_MB = int(os.getenv("MAX_UPLOAD_REQUEST_MB", "500"))  # per request, all files together
+MULTIPART_OVERHEAD_BYTES = 64 * 1024  # boundaries and part headers around a single file
+
+
+class UploadTooLarge(Exception):
+    """An upload went over the per-file or per-request size limit."""
+
+
+# === Streaming uploads ===
+# Uploads are copied to disk in fixed-size chunks (never held whole in
+# memory), written to a temp file next to the target and renamed into place
+# only once complete. The content is hashed during the copy; the resulting
+# fingerprint has the same shape as embed_files.fingerprint_file, so ingest
+# can use it instead of reading the file again.
+def _temp_path(dest_path):
+    dest_path = Path(dest_path)
+    return dest_path.with_name(f".{dest_path.name}.{uuid.uuid4().hex}.upload")
+
+
+def _finish(md5, size, tmp_path):
+    return {"file_hash": md5.hexdigest(), "file_size": size, "tmp_path": str(tmp_path)}
+
+
+async def stream_upload_to_temp(upload, dest_path, max_bytes, request_budget=None):
+    """Copy a FastAPI UploadFile to a temp file beside dest_path, hashing as it goes.
+
+    request_budget, a one-item list [bytes left for this request], is shared
+    by all files of a request. Raises UploadTooLarge (after removing the temp
+    file) if a limit is exceeded.
+    """
+    tmp_path = _temp_path(dest_path)
+    md5 = hashlib.md5()
+    size = 0
+    try:
+        with open(tmp_path, "wb") as f:
+            while True:
+                block = await upload.read(UPLOAD_CHUNK_SIZE)
+                if not block:
+                    break
+                size += len(block)
+                _check_limits(upload.filename, size, max_bytes, request_budget, len(block))
+                md5.update(block)
+                f.write(block)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    return _finish(md5, size, tmp_path)
+
+
+def stream_file_to_temp(fileobj, dest_path, max_bytes, request_budget=None):
+    """Same as stream_upload_to_temp for a synchronous file-like object (e.g. Streamlit's UploadedFile)."""
+    tmp_path = _temp_path(dest_path)
+    md5 = hashlib.md5()
+    size = 0
+    try:
+        with open(tmp_path, "wb") as f:
+            for block in iter(lambda: fileobj.read(UPLOAD_CHUNK_SIZE), b""):
+                size += len(block)
+                _check_limits(getattr(fileobj, "name", str(dest_path)), size, max_bytes, request_budget, len(block))
+                md5.update(block)
+                f.write(block)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    return _finish(md5, size, tmp_path)
+
+
+def _check_limits(name, size, max_bytes, request_budget, block_size):
+    if size > max_bytes:
+        raise UploadTooLarge(f"{name} is larger than {max_bytes // (1024 * 1024)} MB")
+    if request_budget is not None:
+        request_budget[0] -= block_size
+        if request_budget[0] < 0:
+            raise UploadTooLarge(f"Upload is larger than {MAX_UPLOAD_REQUEST_MB} MB in total")
+
+
+# === Early rejection ===
+# Starlette spools a multipart body to disk before the endpoint runs, so the
+# checks above only start once all of it has arrived. The middleware rejects
+# an upload with 413 before reading it when its Content-Length is over the
+# limit of its route, and stops a body without one (chunked) as soon as it
+# grows past the limit.
+def _too_large(max_bytes):
+    return f"Upload is larger than {max_bytes // (1024 * 1024)} MB"
+
+
+class UploadSizeLimitMiddleware:
+    """ASGI middleware; limits is [(method, path prefix, max request bytes)], first match applies."""
+
+    def __init__(self, app, limits):
+        self.app = app
+        self.limits = limits
+
+    def _limit(self, scope):
+        for method, prefix, max_bytes in self.limits:
+            if scope["method"] == method and scope["path"].startswith(prefix):
+                return max_bytes
+        return None
+
+    async def __call__(self, scope, receive, send):
+        max_bytes = self._limit(scope) if scope["type"] == "http" else None
+        if max_bytes is None:
+            await self.app(scope, receive, send)
+            return
+        content_length = dict(scope["headers"]).get(b"content-length", b"")
+        if content_length.isdigit() and int(content_length) > max_bytes:
+            response = JSONResponse({"detail": _too_large(max_bytes)}, status_code=413, headers={"Connection": "close"})
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            received += len(message.get("body", b""))
+            if received > max_bytes:
+                raise HTTPException(status_code=413, detail=_too_large(max_bytes))
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
+def commit_upload(staged, dest_path):
+    """Atomically move a staged upload into place; returns its fingerprint
+    ({file_hash, file_size, mtime_ns}) for the ingest pipeline."""
+    os.replace(staged["tmp_path"], dest_path)
+    return {"file_hash": staged["file_hash"], "file_size": staged["file_size"], "mtime_ns": os.stat(dest_path).st_mtime_ns}
+
+
+def discard_uploads(staged_uploads):
+    for staged in staged_uploads:
+        Path(staged["tmp_path"]).unlink(missing_ok=True)
@@ -1,18 +1,34 @@
 from fastapi import FastAPI , UploadFile, File , Query , Depends ,HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
 import os
+import logging
 from typing import List , Dict, Any
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse , Response
 from pydantic import BaseModel , EmailStr
 from passlib.context import CryptContext
 from sqlalchemy.orm import Session
 from datetime import datetime
+import json
+import base64
+from sqlalchemy.orm import selectinload
+from sqlalchemy import or_ , and_
 
-from app.embed_files import embed_folder , INPUT_FOLDER ,VECTOR_DB_PATH
-from app.compare_cvs import compare_with_job_description # importing the function
+from app.ingest_jobs import submit_ingest , get_job , run_exclusive
+from app.uploads import (
+    stream_upload_to_temp , commit_upload , discard_uploads , UploadTooLarge , UploadSizeLimitMiddleware ,
+    MAX_UPLOAD_FILE_MB , MAX_UPLOAD_REQUEST_MB , MULTIPART_OVERHEAD_BYTES ,
+)
 from app.database.database import SessionLocal
-from app.models.user_model import User , UserLogin , UserCreate , MatchHistory , MatchResult , MatchHistorySchema ,MatchResultSchema
+from app.models.user_model import User , UserLogin , UserCreate , MatchHistory , MatchResult , MatchHistorySchema ,MatchResultSchema , MatchHistoryPage , CompareBatchRequest
+from app.init.init_db import create_missing_indexes
 from app.utils.auth import create_access_token
+from app.metrics import render as render_metrics
+from app import ml_stack
+
+# LOG_LEVEL=DEBUG also logs the matched text of every hit
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO").upper(), format="%(levelname)s %(name)s: %(message)s")
+logger = logging.getLogger(__name__)
 
 
 app = FastAPI(
@@ -29,6 +45,34 @@ app.add_middleware(
     allow_headers=["*"],       # ✅ allow all headers
 ) 
 
+# reject oversized uploads from their Content-Length, before the body is spooled
+app.add_middleware(
+    UploadSizeLimitMiddleware,
+    limits=[
+        ("POST", "/hrassistantai/upload_cv_embed", MAX_UPLOAD_REQUEST_MB * 1024 * 1024),
+        ("PUT", "/hrassistantai/cvs/", MAX_UPLOAD_FILE_MB * 1024 * 1024 + MULTIPART_OVERHEAD_BYTES),
+    ],
+)
+
+# Nothing above loads the ML stack (langchain, torch, faiss, the document loaders),
+# so auth and history routes serve right away. Handlers that need it import
+# app.compare_cvs / app.embed_files themselves; the warm-up thread loads both,
+# with the embedding model and vector store, before the first such request.
+INPUT_FOLDER = "cv_documents"  # same folders as app.embed_files
+VECTOR_DB_PATH = "cv_vectorstore"
+
+@app.on_event("startup")
+def warm_up_ml_stack():
+    ml_stack.start_warm_up()
+
+# add indexes introduced after the tables were created
+@app.on_event("startup")
+def ensure_db_indexes():
+    create_missing_indexes()
+
+HISTORY_PAGE_SIZE = 20  # match history entries per page by default
+HISTORY_MAX_PAGE_SIZE = 100
+
 #password hashing
 pwd_context = CryptContext(schemes=["bcrypt"] , deprecated="auto")
 
@@ -44,9 +88,7 @@ def get_db():
 # create a login end point
 @app.post("/hrassistantai/login" , status_code=200)
 def login(user: UserLogin, db:Session = Depends(get_db)):   
-    print("🚀 Login endpoint CALLED!", flush=True)
     db_user = db.query(User).filter(User.email == user.email).first()
-    print(f"User Details: {db_user}", flush=True)
     if not db_user:
         #raise HTTPException(status_code=400 , detail="User not found")
         return { "status_code" : 400 , "message" : "User not found" }
@@ -89,80 +131,306 @@ def create_user(user:UserCreate , db:Session= Depends(get_db)):
 #call function to upload files
 async def upload_cv_embed(files: list[UploadFile] = File(...)):
     """
-    Upload CV files and create a vector store for comparison.
+    Upload CV files and queue them for embedding.
+    Returns a job id; poll /hrassistantai/ingest_jobs/{job_id} for progress.
     """
     # Create upload folder if it doesn't exist
     os.makedirs(INPUT_FOLDER, exist_ok=True)
 
+    # Stream every file to a temp file (hashing on the way), within the size limits
+    staged = []
+    request_budget = [MAX_UPLOAD_REQUEST_MB * 1024 * 1024]
+    try:
+        for file in files:
+            path = os.path.join(INPUT_FOLDER, os.path.basename(file.filename))
+            staged.append(await stream_upload_to_temp(file, path, MAX_UPLOAD_FILE_MB * 1024 * 1024, request_budget))
+    except UploadTooLarge as e:
+        discard_uploads(staged)
+        raise HTTPException(status_code=413, detail=str(e))
+
+    # All files arrived complete: move them into place
     saved = []
-    # Save uploaded files
-    for file in files:
-        path = os.path.join(INPUT_FOLDER, file.filename)
-        with open(path, "wb") as f:
-            f.write(await file.read())
-        saved.append(file.filename)
-
-    #print the saved files
-    print(f"Files saved: {', '.join(saved)}") 
-
-    # Embed the folder and create vector store
-    result = embed_folder(INPUT_FOLDER, VECTOR_DB_PATH)
-    
+    fingerprints = {}
+    for file, upload in zip(files, staged):
+        file_name = os.path.basename(file.filename)
+        path = os.path.join(INPUT_FOLDER, file_name)
+        fingerprints[path] = commit_upload(upload, path)
+        saved.append(file_name)
+
+    logger.info("Files saved: %s", ", ".join(saved))
+
+    # Embed the folder in the background (merged into an already queued run if there is one);
+    # the hashes computed during upload are reused, the files are not read again to fingerprint them
+    job_id , merged = submit_ingest(INPUT_FOLDER, VECTOR_DB_PATH, saved, fingerprints)
+
     return {
-        "message": "CVs processed successfully.",
-        "summary": result,
+        "message": "CVs uploaded, processing started.",
+        "job_id": job_id,
+        "merged": merged,
         "saved_files": saved
     }
 
+
+@app.get("/hrassistantai/ingest_jobs/{job_id}")
+def ingest_job_status(job_id: str):
+    """
+    Report the progress of a background ingest job.
+    """
+    job = get_job(job_id)
+    if job is None:
+        return { "status_code" : 404 , "message" : "Job not found" }
+    return job
+
+@app.delete("/hrassistantai/cvs/{file_name}")
+def delete_cv(file_name: str):
+    """
+    Remove one CV from the upload folder and from the vector store.
+    """
+    if os.path.basename(file_name) != file_name:
+        return { "status_code" : 400 , "message" : "Invalid file name" }
+    path = os.path.join(INPUT_FOLDER, file_name)
+
+    # remove the file first, so a crash half way never leaves it to be re-ingested as unchanged
+    existed = os.path.exists(path)
+    if existed:
+        os.remove(path)
+    from app.embed_files import delete_file
+
+    try:
+        removed = run_exclusive(delete_file, path, VECTOR_DB_PATH)
+    except TimeoutError as e:
+        return { "status_code" : 409 , "message" : str(e) }
+
+    if not existed and not removed:
+        return { "status_code" : 404 , "message" : "CV not found" }
+    return { "status_code" : 200 , "file_name": file_name , "removed_chunks": removed }
+
+
+def replace_indexed_file(path, fingerprint):
+    """ replace_file under the index lock (importing the ML stack on first use) """
+    from app.embed_files import replace_file
+
+    return run_exclusive(replace_file, path, VECTOR_DB_PATH, fingerprint)
+
+
+@app.put("/hrassistantai/cvs/{file_name}")
+async def replace_cv(file_name: str, file: UploadFile = File(...)):
+    """
+    Replace (or add) one CV and re-embed only that file.
+    """
+    if os.path.basename(file_name) != file_name:
+        return { "status_code" : 400 , "message" : "Invalid file name" }
+    os.makedirs(INPUT_FOLDER, exist_ok=True)
+    path = os.path.join(INPUT_FOLDER, file_name)
+
+    # streamed to a temp file and renamed, so the old version stays intact until the new one is complete
+    try:
+        staged = await stream_upload_to_temp(file, path, MAX_UPLOAD_FILE_MB * 1024 * 1024)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    fingerprint = commit_upload(staged, path)
+
+    # waiting for the index lock, embedding and writing the store block for a long time:
+    # run them on the thread pool, not on the event loop
+    try:
+        summary = await run_in_threadpool(replace_indexed_file, path, fingerprint)
+    except TimeoutError as e:
+        return { "status_code" : 409 , "message" : str(e) }
+    except ValueError as e:
+        return { "status_code" : 400 , "message" : str(e) }
+
+    return { "status_code" : 200 , "summary": summary }
+
+
 @app.get("/hrassistantai/compare_job_description")
 #call function to compare job description with stored CVs
-def compare_job_description_endpoint(job_description: str):
+def compare_job_description_endpoint(job_description: str, n_results: int | None = Query(None, ge=1),
+                                     sections: List[str] | None = Query(None), section_weights: str | None = None,
+                                     must_have: List[str] | None = Query(None), exclude: List[str] | None = Query(None),
+                                     lexical_weight: float = Query(0.0, ge=0, le=1)):
     """
     Compare a job description with stored CVs and return the best matches.
     Pass the job description as a query paramenter or request body.
+    Pass n_results to always get that many distinct CVs back.
+    Pass sections (repeatable, e.g. sections=skills&sections=experience) to match only those CV sections,
+    and section_weights (e.g. "skills:2,experience:1.5") to favour some of them.
+    Pass must_have / exclude (repeatable, e.g. must_have=Django&must_have=AWS) to keep only CVs
+    mentioning all / none of those keywords, and lexical_weight (0-1) to blend keyword matching into the ranking.
     """
-  
-    # call your existsing logic to compare job description with stored CVs
-    results = compare_with_job_description(job_description)
+    from app.compare_cvs import compare_with_job_description
+
+    try:
+        weights = parse_section_weights(section_weights)
+        # call your existsing logic to compare job description with stored CVs
+        results = compare_with_job_description(
+            job_description, n_results=n_results, sections=sections, section_weights=weights,
+            must_have=must_have, exclude=exclude, lexical_weight=lexical_weight,
+        )
+    except ValueError as e:
+        return { "status_code" : 400 , "message" : str(e) }
+
+    return JSONResponse(content={"matches" : serialize_matches(results)})
+
+
+@app.post("/hrassistantai/compare_job_descriptions")
+#compare many job descriptions in one batched embedding + search pass
+def compare_job_descriptions_endpoint(request: CompareBatchRequest):
+    """
+    Compare a list of job descriptions with stored CVs.
+    Returns the best matches per job description, in request order.
+    """
+    from app.compare_cvs import compare_many_job_descriptions
+
+    try:
+        all_results = compare_many_job_descriptions(
+            request.job_descriptions, n_results=request.n_results,
+            sections=request.sections, section_weights=request.section_weights,
+            must_have=request.must_have, exclude=request.exclude, lexical_weight=request.lexical_weight,
+        )
+    except ValueError as e:
+        return { "status_code" : 400 , "message" : str(e) }
 
-    #convert the results (Document object) into serializable data
+    output = []
+    for job_description , results in zip(request.job_descriptions, all_results):
+        output.append({
+            "job_description": job_description,
+            "matches": serialize_matches(results)
+        })
+
+    return JSONResponse(content={"results" : output})
+
+
+@app.get("/metrics")
+def metrics():
+    """
+    Prometheus metrics: per-stage latency histograms, document / chunk / failure counters, index size and memory.
+    """
+    body , content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
+
+@app.get("/hrassistantai/embedding_batcher/stats")
+def embedding_batcher_stats():
+    """
+    Batch fill rate and queue wait of the shared query embedder.
+    """
+    from app.compare_cvs import get_batcher
+
+    return get_batcher().stats()
+
+
+@app.get("/hrassistantai/query_cache/stats")
+def query_cache_stats():
+    """
+    Hit rate, size and memory of the query embedding and result caches.
+    """
+    from app import query_cache
+
+    return query_cache.stats()
+
+
+@app.get("/health/live")
+def liveness():
+    """
+    Liveness probe: the process serves requests. Fails only if loading the ML stack failed.
+    """
+    state = ml_stack.status()
+    return JSONResponse(status_code=200 if ml_stack.is_alive() else 503, content=state)
+
+
+@app.get("/health/ready")
+def readiness():
+    """
+    Readiness probe: the ML stack (embedding model and vector store) is loaded, or loads lazily (ML_WARM_UP=lazy).
+    """
+    state = ml_stack.status()
+    return JSONResponse(status_code=200 if ml_stack.is_ready() else 503, content=state)
+
+
+def parse_section_weights(text):
+    """ "skills:2,experience:1.5" -> {"skills": 2.0, "experience": 1.5} """
+    if not text:
+        return None
+    weights = {}
+    for item in text.split(","):
+        section , _ , weight = item.partition(":")
+        try:
+            weights[section.strip()] = float(weight)
+        except ValueError:
+            raise ValueError(f"Invalid section weight {item!r}, expected section:weight") from None
+    return weights
+
+
+def serialize_matches(results):
+    """ convert the results (Document object) into serializable data """
     output = []
     for file_name , (doc ,score) in results.items():
         output.append({
             "file_name": file_name,
             "Score": float(score),
-            "Matched_content" : doc.page_content[:500]
+            "Matched_content" : doc.page_content[:500],
+            "Section" : doc.metadata.get("section")
         })
-
-    return JSONResponse(content={"matches" : output})
+    return output
 
 
 @app.post("/hrassistantai/save_matches")
 def save_matches_history(user_id:int , job_description: str , matches: List , db: Session = Depends(get_db)):
+    # history row and all its results go in one transaction; the results are inserted in one batch
     history = MatchHistory(user_id=user_id , job_description=job_description , created_at=datetime.utcnow())
-    db.add(history)
-    db.commit()
-    db.refresh(history)
-
-    for m in matches:
-        result = MatchResult(
-            history_id = history.id,
+    history.results = [
+        MatchResult(
             file_name=m["file_name"],
             score=m["score"],
             matched_content=m.get("Matched_content","")
         )
-        db.add(result)
+        for m in matches
+    ]
+    db.add(history)
+    db.flush()
+    history_id = history.id
     db.commit()
 
-    return { "status": "ok", "history_id": history.id }
+    return { "status": "ok", "history_id": history_id }
  
 
-@app.get("/hrassistantai/match_history/{user_id}" , response_model=List[MatchHistorySchema])
-def get_match_history(user_id:int , db:Session = Depends(get_db)):
-    history_records = (
-        db.query(MatchHistory).
-        filter(MatchHistory.user_id == user_id)
-        .all()
+def encode_history_cursor(record):
+    """ opaque cursor pointing just after record in newest-first order """
+    key = json.dumps([record.created_at.isoformat(), record.id])
+    return base64.urlsafe_b64encode(key.encode()).decode()
+
+
+def decode_history_cursor(cursor):
+    try:
+        created_at , history_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(created_at) , int(history_id)
+    except (ValueError, TypeError) as e:
+        raise HTTPException(status_code=400, detail="Invalid cursor") from e
+
+
+@app.get("/hrassistantai/match_history/{user_id}" , response_model=MatchHistoryPage)
+def get_match_history(user_id:int , limit: int = Query(HISTORY_PAGE_SIZE, ge=1, le=HISTORY_MAX_PAGE_SIZE),
+                      cursor: str | None = None , db:Session = Depends(get_db)):
+    """
+    A user's match history, newest first, one page at a time.
+    Pass the returned next_cursor back as cursor to get the next page.
+    """
+    query = (
+        db.query(MatchHistory)
+        .filter(MatchHistory.user_id == user_id)
+        # all results of the page in one extra query instead of one per history entry
+        .options(selectinload(MatchHistory.results))
+        .order_by(MatchHistory.created_at.desc(), MatchHistory.id.desc())
     )
+    if cursor:
+        created_at , history_id = decode_history_cursor(cursor)
+        query = query.filter(or_(
+            MatchHistory.created_at < created_at,
+            and_(MatchHistory.created_at == created_at, MatchHistory.id < history_id),
+        ))
+
+    # one extra row tells us whether there is a next page
+    history_records = query.limit(limit + 1).all()
+    next_cursor = encode_history_cursor(history_records[limit - 1]) if len(history_records) > limit else None
 
-    return history_records
+    return { "items": history_records[:limit] , "next_cursor": next_cursor }
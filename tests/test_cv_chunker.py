@@ -0,0 +1,45 @@
+import pytest
+
+pytest.importorskip("langchain")
+pytest.importorskip("faiss")
+pytest.importorskip("fpdf")
+pytest.importorskip("pypdf")
+pytest.importorskip("docx2txt")
+
+from langchain_core.documents import Document
+
+from app.cv_chunker import CHUNK_SIZE, MIN_CHUNK_SIZE, SECTIONS, section_chunks, recursive_chunks
+from app.embed_files import load_and_process_documents
+from app.sample_cv_creator import generate_corpus
+
+
+@pytest.fixture(scope="module")
+def corpus(tmp_path_factory):
+    """Pages of 90 CVs written and loaded the way the benchmark does (pdf, docx and txt)."""
+    folder = tmp_path_factory.mktemp("cvs")
+    generate_corpus(str(folder), 90)
+    docs, failed = load_and_process_documents(str(folder), use_cache=False)
+    assert not failed
+    return docs
+
+
+def test_section_chunks_are_fewer_than_recursive(corpus):
+    assert len(section_chunks(corpus)) < len(recursive_chunks(corpus))
+
+
+def test_section_chunks_stay_within_size_and_carry_sections(corpus):
+    for chunk in section_chunks(corpus):
+        assert len(chunk.page_content) <= CHUNK_SIZE
+        assert chunk.metadata["section"] in SECTIONS
+        assert set(chunk.metadata["sections"]) <= set(SECTIONS)
+
+
+def test_short_pack_is_filled_from_the_next_section():
+    experience = "\n".join(f"- Built service {i} using Python, for {i}k users." for i in range(40))
+    text = f"Jane Doe\nEmail: jane@example.com\n\nEXPERIENCE\n{experience}"
+    chunks = section_chunks([Document(page_content=text, metadata={"source_file": "cv.txt"})])
+    first = chunks[0]
+    assert first.metadata["sections"] == ["header", "experience"]
+    assert len(first.page_content) > MIN_CHUNK_SIZE
+    # nothing is lost at the cut
+    assert "Built service 0 " in first.page_content and any("Built service 39 " in chunk.page_content for chunk in chunks)
@@ -0,0 +1,76 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("faiss")
+pytest.importorskip("langchain_community")
+
+from langchain_core.documents import Document
+
+from app import embed_files, embedding_parity
+from app.chunk_store import ChunkStore
+from app.embed_files import delete_file, save_manifest
+from app.generations import new_generation, current_store_path
+
+FILES = 32
+CHUNKS_PER_FILE = 4
+DIM = 8
+COMPACT_FRACTION = 0.1
+
+
+@pytest.fixture
+def store(tmp_path):
+    """A published store of FILES files with CHUNKS_PER_FILE chunks each (128 chunks)."""
+    root = str(tmp_path / "store")
+    rng = np.random.default_rng(0)
+    manifest = {}
+    with new_generation(root) as generation:
+        vector_store = ChunkStore.create(generation.path, DIM)
+        for f in range(FILES):
+            path = f"/cvs/cv_{f}.txt"
+            chunks = [
+                Document(page_content=f"cv {f} part {i}", metadata={"chunk_id": f"{path}-{i}", "source_file": path, "file_name": f"cv_{f}.txt"})
+                for i in range(CHUNKS_PER_FILE)
+            ]
+            vector_store.add_chunks(chunks, rng.random((CHUNKS_PER_FILE, DIM), dtype=np.float32))
+            manifest[path] = {"file_hash": str(f), "file_size": 1, "mtime_ns": 0, "file_name": f"cv_{f}.txt",
+                              "chunk_ids": [chunk.metadata["chunk_id"] for chunk in chunks]}
+        vector_store.save()
+        vector_store.close()
+        save_manifest(generation.path, manifest)
+    return root
+
+
+def test_repeated_deletes_keep_tombstones_bounded(store, monkeypatch):
+    monkeypatch.setattr(embed_files, "TOMBSTONE_COMPACT_FRACTION", COMPACT_FRACTION)
+    for f in range(FILES):
+        assert delete_file(f"/cvs/cv_{f}.txt", store) == CHUNKS_PER_FILE
+        vector_store = ChunkStore.open(current_store_path(store))
+        try:
+            tombstones = vector_store.tombstone_count()
+            rows = FILES * CHUNKS_PER_FILE - (f + 1) * CHUNKS_PER_FILE
+            # every vector is either a live row or a tombstone ...
+            assert vector_store.ntotal == rows + tombstones
+            # ... and tombstones never pile up past the compaction threshold (plus the file just deleted)
+            assert tombstones <= COMPACT_FRACTION * vector_store.ntotal + CHUNKS_PER_FILE
+        finally:
+            vector_store.close()
+
+
+def test_small_share_of_tombstones_is_not_compacted(store, monkeypatch):
+    monkeypatch.setattr(embed_files, "TOMBSTONE_COMPACT_FRACTION", 0.5)
+    delete_file("/cvs/cv_0.txt", store)
+    vector_store = ChunkStore.open(current_store_path(store))
+    try:
+        assert vector_store.tombstone_count() == CHUNKS_PER_FILE
+        assert vector_store.ntotal == FILES * CHUNKS_PER_FILE
+    finally:
+        vector_store.close()
+
+
+def test_parity_corpus_reads_through_the_delta(store, monkeypatch):
+    monkeypatch.setattr(embed_files, "TOMBSTONE_COMPACT_FRACTION", 0.5)
+    monkeypatch.setattr(embedding_parity, "VECTOR_DB_PATH", store)
+    delete_file("/cvs/cv_0.txt", store)
+    texts = embedding_parity.load_corpus()
+    assert len(texts) == (FILES - 1) * CHUNKS_PER_FILE
+    assert not any(text.startswith("cv 0 ") for text in texts)